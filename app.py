@@ -1,7 +1,13 @@
 import streamlit as st
 
 from src.arg_parser import AppArguments, parse_args
-from src.controller.controller import control_data_selection, control_main_data
+from src.controller.controller import (
+    control_data_selection,
+    control_debug_panel,
+    control_instrumentation,
+    control_main_data,
+    get_shared_cache,
+)
 
 
 def main(args: AppArguments) -> None:
@@ -9,8 +15,23 @@ def main(args: AppArguments) -> None:
         "<h1 style='text-align: center; color: bllack;'>Electricity Monitor</h1>",
         unsafe_allow_html=True,
     )
-    data = control_data_selection(args.data)
-    control_main_data(data, args.model)
+    control_instrumentation(args.trace_memory, args.metrics_host, args.metrics_port)
+    cache = get_shared_cache(args.cache_memory_mb)
+    try:
+        data = control_data_selection(
+            args.data, args.gap_policy, cache, args.snapshot_dir
+        )
+        control_main_data(
+            data,
+            args.model,
+            args.forecast_mode,
+            args.forecast_workers,
+            args.live_refresh_seconds,
+            cache,
+        )
+    finally:
+        if args.debug_panel:
+            control_debug_panel()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,21 @@
+import sys
+
+from src.arg_parser import BatchArguments, parse_batch_args
+from src.batch.forecast_batch import run_batch_forecast
+
+
+def main(args: BatchArguments) -> None:
+    num_failed = run_batch_forecast(
+        args.input_dir,
+        args.output,
+        args.model,
+        args.price_per_kwh,
+        args.workers,
+        args.gap_policy,
+    )
+    if num_failed > 0:
+        sys.exit(f"{num_failed} input(s) failed")
+
+
+if __name__ == "__main__":
+    main(parse_batch_args())
@@ -0,0 +1,80 @@
+import datetime
+from argparse import ArgumentParser
+from pathlib import Path
+
+import pandas as pd
+
+from src.constants import (
+    DEFAULT_DATA_PATH,
+    DEFAULT_DATA_SAMPLING_MINUTE,
+    DEFAULT_MODEL_PATH,
+)
+from src.data.backtest import (
+    BacktestResult,
+    backtest_average,
+    backtest_lgbm,
+    load_backtest_series,
+)
+from src.data.forecaster import LGBMForecaster
+
+
+def print_result(result: BacktestResult) -> None:
+    latencies = result.latencies * 1000
+    print(f"\n{result.name}: {result.num_forecasts} forecasts")
+    print(result.get_device_errors().round(3).to_string())
+    print(
+        f"latency: mean {latencies.mean():.2f} ms, p95 "
+        f"{pd.Series(latencies).quantile(0.95):.2f} ms per forecast, "
+        f"throughput {result.throughput:.1f} forecasts/s"
+    )
+
+
+def main() -> None:
+    parser = ArgumentParser(
+        description="Replay rolling forecast origins over a date range and report the "
+        "kWh error per device together with the forecast latency"
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH)
+    parser.add_argument("--start", type=datetime.datetime.fromisoformat)
+    parser.add_argument("--end", type=datetime.datetime.fromisoformat)
+    parser.add_argument("--horizon-hours", type=float, default=24)
+    parser.add_argument("--stride-hours", type=float, default=6)
+    parser.add_argument(
+        "--batch-size", type=int, default=32, help="Origins per LGBM model call"
+    )
+    parser.add_argument(
+        "--history-days", type=int, default=7, help="Days averaged by the average"
+    )
+    args = parser.parse_args()
+
+    segments = load_backtest_series(Path(args.data), args.start, args.end)
+    horizon = int(args.horizon_hours * 60 // DEFAULT_DATA_SAMPLING_MINUTE)
+    stride = max(1, int(args.stride_hours * 60 // DEFAULT_DATA_SAMPLING_MINUTE))
+    print(
+        f"{len(segments)} segment(s), horizon {horizon} samples, "
+        f"stride {stride} samples, {args.model}"
+    )
+    results = [
+        backtest_average(
+            segments, horizon, stride, args.start, args.end, args.history_days
+        ),
+        backtest_lgbm(
+            LGBMForecaster(Path(args.model)),
+            segments,
+            horizon,
+            stride,
+            args.start,
+            args.end,
+            args.batch_size,
+        ),
+    ]
+    for result in results:
+        if result is None:
+            print("No forecast origin in the range")
+            return
+        print_result(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+import pandas as pd
+from darts import TimeSeries
+
+from benchmark.synthetic import generate_synthetic_data, to_month_data
+from src.controller.forecast_utils import (
+    calculate_forecasted_usage_data,
+    get_days_remaining_of_the_month,
+)
+from src.data.data_handler import extract_daily_data
+from src.data.forecaster import AverageForecaster
+from src.data.rollup import build_rollup
+
+
+class LegacyAverageForecaster:
+    """The dict based forecaster used before the vectorized implementation."""
+
+    def __init__(self):
+        self.means = None
+
+    def fit(self, daily_df: pd.DataFrame) -> "LegacyAverageForecaster":
+        out = {}
+        mean_data = daily_df.mean()
+        for name in daily_df.mean().index:
+            if name == "Date":
+                continue
+            out[name] = mean_data[name]
+        self.means = out
+        return self
+
+    def predict(self, days: float):
+        out = {}
+        for n, v in self.means.items():
+            out[n] = v * days
+        out["All"] = sum(out.values())
+        return out
+
+
+def legacy_forecasted_usage_data(
+    forecaster: LegacyAverageForecaster,
+    series_daily: TimeSeries,
+    days: float,
+    price_per_kwh: float,
+) -> pd.DataFrame:
+    forecasted_usage = forecaster.predict(days)
+    forecast_df = pd.DataFrame(columns=["Device", "Usage (kWh)"])
+    total_data = series_daily.sum(axis=0).pd_dataframe().transpose().reset_index()
+    total_data.columns = ["Device", "Usage (kWh)"]
+    for _, row in total_data.iterrows():
+        device = str(row["Device"])
+        if device not in forecasted_usage:
+            continue
+        new_row = {
+            "Device": device,
+            "Usage (kWh)": forecasted_usage[device] + row["Usage (kWh)"],
+        }
+        forecast_df = pd.concat([forecast_df, pd.DataFrame.from_records([new_row])])
+    forecast_df["Price (Rp)"] = forecast_df["Usage (kWh)"] * price_per_kwh
+    return forecast_df
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Benchmark the average forecast table")
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=14)
+    args = parser.parse_args()
+
+    month_data = to_month_data(generate_synthetic_data(args.devices, args.days))
+    daily_df, daily_series = extract_daily_data(month_data)
+    last_datetime = month_data["Datetime"].max().to_pydatetime()
+    days = get_days_remaining_of_the_month(last_datetime)
+    print(f"{args.devices} devices, {args.days} days of daily usage")
+
+    start = time.perf_counter()
+    new_df = calculate_forecasted_usage_data(
+        AverageForecaster().fit(daily_df), build_rollup(month_data), last_datetime, 1000
+    )
+    new_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    old_df = legacy_forecasted_usage_data(
+        LegacyAverageForecaster().fit(daily_df), daily_series, days, 1000
+    )
+    old_time = time.perf_counter() - start
+
+    assert np.allclose(new_df["Usage (kWh)"], old_df["Usage (kWh)"].astype(float))
+    print(f"vectorized: {new_time:8.3f} s")
+    print(f"per row:    {old_time:8.3f} s")
+    print(f"speedup:    {old_time / new_time:8.1f}x, identical table")
+
+
+if __name__ == "__main__":
+    main()
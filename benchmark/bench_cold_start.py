@@ -0,0 +1,104 @@
+import json
+import subprocess
+import sys
+import tempfile
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import List
+
+from benchmark.synthetic import generate_synthetic_data, to_csv_data
+from src.constants import DEFAULT_DATA_PATH
+
+# Runs in a fresh interpreter, so the imports of the app are part of the timing
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+
+sys.argv = ["app.py", *json.loads(sys.argv[1])]
+at = AppTest.from_file("app.py", default_timeout=600)
+at.run()
+first_render = time.perf_counter() - start
+heavy = [m for m in ("darts", "lightgbm", "plotly.express") if m in sys.modules]
+
+at.number_input[0].set_value(1000).run()
+at.selectbox[0].set_value(at.selectbox[0].options[0]).run()
+at.selectbox[1].set_value(at.selectbox[1].options[0]).run()
+assert len(at.exception) == 0, at.exception
+month_render = time.perf_counter() - start
+print(json.dumps([first_render, month_render, heavy]))
+"""
+
+
+def run_cold_start(app_args: List[str]) -> tuple:
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", CHILD, json.dumps(app_args)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return tuple(json.loads(result.stdout.strip().splitlines()[-1]))
+
+
+def main() -> None:
+    parser = ArgumentParser(
+        description="Measure the time from a fresh process until the first page and "
+        "the first month of the dashboard are rendered"
+    )
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH)
+    parser.add_argument(
+        "--synthetic-devices",
+        type=int,
+        default=0,
+        help="Replace --data with synthetic data of this many devices",
+    )
+    parser.add_argument("--synthetic-days", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--no-snapshot",
+        action="store_true",
+        help="Only measure the start without a snapshot directory",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = Path(args.data)
+        if args.synthetic_devices > 0:
+            data_path = Path(tmp) / "data.csv"
+            data = generate_synthetic_data(args.synthetic_devices, args.synthetic_days)
+            to_csv_data(data).to_csv(data_path, index=False)
+        print(f"{data_path} ({data_path.stat().st_size / 2**20:.1f} MB)")
+
+        snapshot_dir = Path(tmp) / "snapshot"
+        scenarios = [("no snapshot", ["--data", str(data_path)], False)]
+        if not args.no_snapshot:
+            snapshot_args = [
+                "--data",
+                str(data_path),
+                "--snapshot-dir",
+                str(snapshot_dir),
+            ]
+            scenarios += [
+                ("snapshot, cold", snapshot_args, True),
+                ("snapshot, warm", snapshot_args, False),
+            ]
+        print(f"{'start':<16s} {'first page':>11s} {'first month':>12s}  imported")
+        for name, app_args, clear in scenarios:
+            best = None
+            for _ in range(args.repeat):
+                if clear:
+                    for f in snapshot_dir.glob("*"):
+                        f.unlink()
+                result = run_cold_start(app_args)
+                if best is None or result[0] < best[0]:
+                    best = result
+            assert best is not None
+            first_render, month_render, heavy = best
+            print(
+                f"{name:<16s} {first_render:10.2f}s {month_render:11.2f}s  "
+                f"{', '.join(heavy) or '-'}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import datetime
+import os
+import tempfile
+from argparse import ArgumentParser
+from pathlib import Path
+
+import pandas as pd
+
+from benchmark.synthetic import generate_synthetic_data, to_csv_data
+from src.constants import DEFAULT_DATA_SAMPLING_MINUTE
+from src.data.data_handler import read_csv_source
+from src.data.time_utils import get_minute_of_day
+
+
+def read_legacy_data(csv_path: Path) -> pd.DataFrame:
+    """The frame layout used before the dtypes were given at parse time."""
+    data = pd.read_csv(csv_path)
+    data["Power (W)"] = data["Voltage (V)"] * data["Ampere (A)"]
+    data["Datetime"] = pd.to_datetime(data["Timestamp"], format="%Y-%m-%d %H:%M:%S")
+    data.insert(
+        loc=1, column="Minute of day", value=get_minute_of_day(data["Datetime"])
+    )
+    return data
+
+
+def get_column_memory(data: pd.DataFrame) -> pd.Series:
+    return data.memory_usage(deep=True, index=False)
+
+
+def write_synthetic_csv(csv_path: Path, num_devices: int, num_days: int) -> None:
+    # written in weekly chunks to keep the generator memory small
+    start = datetime.date(2024, 1, 1)
+    for offset in range(0, num_days, 7):
+        data = generate_synthetic_data(
+            num_devices,
+            min(7, num_days - offset),
+            start=(start + datetime.timedelta(days=offset)).isoformat(),
+            seed=offset,
+        )
+        to_csv_data(data).to_csv(
+            csv_path, mode="a", header=offset == 0, index=False
+        )
+
+
+def main() -> None:
+    parser = ArgumentParser(
+        description="Compare the memory of the loaded data before and after the "
+        "compact dtypes"
+    )
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "data.csv"
+        write_synthetic_csv(csv_path, args.devices, args.days)
+
+        legacy = get_column_memory(read_legacy_data(csv_path))
+        source = read_csv_source(csv_path, os.stat(csv_path))
+        num_rows = len(source.data)
+        compact = get_column_memory(source.data)
+        dtypes = source.data.dtypes.astype(str)
+
+    report = pd.DataFrame({"before (MB)": legacy, "after (MB)": compact}) / 2**20
+    report["dtype after"] = dtypes
+    print(f"{args.devices} devices, {args.days} days, {num_rows:,} rows")
+    print(report.round(1).fillna("-").to_string())
+    print(
+        f"total: {legacy.sum() / 2**20:8.1f} MB -> {compact.sum() / 2**20:8.1f} MB "
+        f"({legacy.sum() / compact.sum():.1f}x smaller)"
+    )
+    year_rows = args.devices * 365 * 24 * 60 // DEFAULT_DATA_SAMPLING_MINUTE
+    print(
+        f"one year of {args.devices} devices ({year_rows:,} rows): "
+        f"{legacy.sum() / num_rows * year_rows / 2**30:.2f} GB -> "
+        f"{compact.sum() / num_rows * year_rows / 2**30:.2f} GB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import time
+from argparse import ArgumentParser
+
+import pandas as pd
+from darts import TimeSeries
+
+from benchmark.synthetic import generate_synthetic_data, to_month_data
+from src.constants import DEFAULT_DATA_SAMPLING_MINUTE
+from src.data.data_handler import extract_minutely_data
+
+
+def legacy_extract_minutely_data(month_data: pd.DataFrame) -> pd.DataFrame:
+    """The pairwise merge implementation used before the vectorized pivot."""
+    pivot_data = []
+    month_data = month_data.loc[:, ["Datetime", "Power (W)", "Device ID"]]
+    for dev_id, d in month_data.groupby("Device ID"):
+        del d["Device ID"]
+        d = d.rename(columns={"Power (W)": dev_id})
+        pivot_data.append(d)
+    data_min_df = pivot_data[0]
+    for d in pivot_data[1:]:
+        data_min_df = pd.merge(data_min_df, d)
+    TimeSeries.from_dataframe(
+        data_min_df,
+        time_col="Datetime",
+        value_cols=[c for c in data_min_df.columns if c not in ["Datetime"]],
+        fill_missing_dates=True,
+        freq=f"{DEFAULT_DATA_SAMPLING_MINUTE}min",
+    )
+    return data_min_df
+
+
+def timed(func, *args, repeat: int = 1):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Benchmark the minutely pivot of DataHandler")
+    parser.add_argument("--devices", type=int, default=120)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--gap-rate", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    month_data = to_month_data(
+        generate_synthetic_data(args.devices, args.days, args.gap_rate)
+    )
+    print(f"{len(month_data):,} readings, {args.devices} devices, {args.days} days")
+
+    new_time, (new_df, _) = timed(extract_minutely_data, month_data, repeat=args.repeat)
+    print(f"vectorized pivot: {new_time:8.3f} s ({len(new_df):,} rows)")
+    if args.skip_legacy:
+        return
+    old_time, old_df = timed(legacy_extract_minutely_data, month_data)
+    print(
+        f"pairwise merge:   {old_time:8.3f} s ({len(old_df):,} rows, "
+        f"{len(new_df) - len(old_df):,} timestamps dropped by gaps)"
+    )
+    print(f"speedup:          {old_time / new_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.constants import (
+    DEFAULT_DATA_PATH,
+    DEFAULT_DATA_SAMPLING_MINUTE,
+    DEFAULT_MODEL_PATH,
+)
+from src.data.data_handler import create_data_handler
+from src.data.forecaster import (
+    LGBMForecaster,
+    NativeLGBMForecaster,
+    get_month_end_date,
+)
+
+
+def main() -> None:
+    parser = ArgumentParser(
+        description="Compare the darts and the native LightGBM forecast rollout"
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH)
+    parser.add_argument(
+        "--series", type=int, default=4, help="Number of series in the batch"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    handler = create_data_handler(Path(args.data))
+    handler.load_data()
+    year, months = next(iter(handler.get_years_and_months().items()))
+    handler.set_year_and_month(year, months[0])
+    series = handler.month_series_minutely
+    assert series is not None
+    # shorter histories of the same month stand in for other months of a batch
+    day_samples = 24 * 60 // DEFAULT_DATA_SAMPLING_MINUTE
+    batch = [series[: len(series) - i * day_samples] for i in range(args.series)]
+    # the month end horizon of the shortest history covers the rest of the month
+    month_end = pd.Timestamp(get_month_end_date(batch[-1].end_time().date()))
+    month_end += pd.Timedelta(days=1)
+    horizons = {
+        "1 hour": day_samples // 24,
+        "1 day": day_samples,
+        "1 week": 7 * day_samples,
+        "month end": (month_end - batch[-1].end_time()) // series.freq - 1,
+    }
+
+    darts = LGBMForecaster(Path(args.model))
+    native = NativeLGBMForecaster(Path(args.model))
+    print(f"{len(batch)} series of {series.n_components} devices, {args.model}")
+    print(f"{'horizon':<12s} {'samples':>8s} {'darts':>10s} {'native':>10s} speedup")
+    for name, horizon in horizons.items():
+        timings = []
+        for forecaster in (darts, native):
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                forecasts = forecaster.predict_samples(batch, horizon)
+                best = min(best, time.perf_counter() - start)
+            timings.append((best, forecasts))
+        (darts_time, expected), (native_time, forecasts) = timings
+        for e, f in zip(expected, forecasts):
+            assert (e.time_index == f.time_index).all()
+            np.testing.assert_allclose(e.values(), f.values())
+        print(
+            f"{name:<12s} {horizon:8d} {darts_time:9.3f}s {native_time:9.3f}s "
+            f"{darts_time / native_time:6.1f}x"
+        )
+    print("identical forecast")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+import numpy as np
+
+from src.constants import DEFAULT_DATA_PATH, DEFAULT_MODEL_PATH
+from src.data.data_handler import create_data_handler
+from src.data.forecaster import ParallelLGBMForecaster, get_month_end_date
+
+
+def main() -> None:
+    parser = ArgumentParser(
+        description="Compare the serial and the process pool forecast rollout"
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--series", type=int, default=4, help="Number of series in the batch"
+    )
+    args = parser.parse_args()
+
+    handler = create_data_handler(Path(args.data))
+    handler.load_data()
+    year, months = next(iter(handler.get_years_and_months().items()))
+    handler.set_year_and_month(year, months[0])
+    series = handler.month_series_minutely
+    assert series is not None
+    # shorter histories of the same month stand in for other months of a batch
+    batch = [series[: len(series) - i * 288] for i in range(args.series)]
+    targets = [get_month_end_date(s.end_time().date()) for s in batch]
+
+    serial = ParallelLGBMForecaster(Path(args.model), workers=1)
+    start = time.perf_counter()
+    expected = serial.predict_batch(batch, targets)
+    serial_time = time.perf_counter() - start
+
+    parallel = ParallelLGBMForecaster(Path(args.model), workers=args.workers)
+    start = time.perf_counter()
+    parallel.predict_batch(batch, targets)
+    cold_time = time.perf_counter() - start
+    start = time.perf_counter()
+    forecasts = parallel.predict_batch(batch, targets)
+    warm_time = time.perf_counter() - start
+    parallel.close()
+
+    for e, f in zip(expected, forecasts):
+        assert e is not None and f is not None
+        np.testing.assert_allclose(e.values(), f.values())
+    print(f"{len(batch)} series of {series.n_components} devices, {args.model}")
+    print(f"serial:              {serial_time:8.3f} s")
+    print(f"{args.workers} workers (cold):    {cold_time:8.3f} s")
+    print(f"{args.workers} workers (warm):    {warm_time:8.3f} s, identical forecast")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import datetime
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from pathlib import Path
+
+from benchmark.synthetic import generate_synthetic_data
+from src.data.partitioned_store import PartitionedDataHandler, write_partitions
+
+
+def main() -> None:
+    parser = ArgumentParser(
+        description="Measure the time and peak memory of date range queries"
+    )
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--months", type=int, default=12)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        for month in range(args.months):
+            start = datetime.date(2024 + month // 12, month % 12 + 1, 1)
+            data = generate_synthetic_data(
+                args.devices, 28, start=start.isoformat(), seed=month
+            )
+            write_partitions(data, Path(root))
+        print(f"{args.devices} devices, {args.months} months of partitions")
+
+        for num_months in sorted({1, 3, args.months}):
+            handler = PartitionedDataHandler(Path(root))
+            handler.load_data()
+            start = datetime.datetime(2024, 1, 1)
+            end = datetime.datetime(2024 + num_months // 12, num_months % 12 + 1, 1)
+            tracemalloc.start()
+            begin = time.perf_counter()
+            rollup = handler.get_range_rollup(start, end)
+            elapsed = time.perf_counter() - begin
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            assert rollup is not None
+            print(
+                f"{num_months:3d} month(s): {elapsed:8.3f} s, "
+                f"peak {peak / 1024 / 1024:8.1f} MB, "
+                f"{len(rollup.daily)} days x {len(rollup.devices)} devices"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import os
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmark.synthetic import to_csv_data
+from src.constants import DEFAULT_DATA_SAMPLING_MINUTE
+from src.data.data_handler import read_csv_source
+from src.data.resampling import resample_readings
+
+
+def generate_meter_readings(
+    power: pd.DataFrame,
+    interval_seconds: float,
+    jitter_seconds: float,
+    dropout_rate: float,
+    seed: int = 0,
+) -> pd.DataFrame:
+    # every device samples the minutely power at jittered times
+    rng = np.random.default_rng(seed)
+    start = power.index[0].value
+    span = power.index[-1].value + 60 * 10**9 - start
+    frames = []
+    for device in power.columns:
+        offsets = np.arange(0, span, int(interval_seconds * 1e9))
+        jitter = rng.uniform(-jitter_seconds, jitter_seconds, size=len(offsets))
+        offsets = np.clip(offsets + (jitter * 1e9).astype(np.int64), 0, span - 1)
+        offsets = np.sort(offsets[rng.random(len(offsets)) >= dropout_rate])
+        times = start + offsets // 10**9 * 10**9
+        minutes = (times - start) // (60 * 10**9)
+        frames.append(
+            pd.DataFrame(
+                {
+                    "Voltage (V)": np.float32(220.0),
+                    "Ampere (A)": (power[device].to_numpy()[minutes] / 220).round(4),
+                    "Datetime": pd.to_datetime(times),
+                    "Device ID": device,
+                }
+            )
+        )
+    return pd.concat(frames, ignore_index=True).sort_values("Datetime", kind="stable")
+
+
+def get_kwh(readings: pd.DataFrame) -> float:
+    data = readings.loc[:, ["Datetime", "Device ID"]]
+    data["Power (W)"] = readings["Voltage (V)"] * readings["Ampere (A)"]
+    data["Device ID"] = data["Device ID"].astype("category")
+    return float(resample_readings(data)["Energy (kWh)"].sum())
+
+
+def main() -> None:
+    parser = ArgumentParser(
+        description="Compare the kWh integrated from meters with different reporting "
+        "rates against the true energy, and the memory of a streamed CSV read"
+    )
+    parser.add_argument("--devices", type=int, default=20)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--interval-seconds", type=float, default=10)
+    parser.add_argument("--jitter-seconds", type=float, default=2)
+    parser.add_argument("--dropout-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2024-01-01", periods=args.days * 24 * 60, freq="min")
+    levels = rng.choice([0.0, 5.0, 60.0, 150.0, 900.0], size=(len(index), args.devices))
+    # appliances keep their power for a while before switching
+    levels = pd.DataFrame(levels, index=index).iloc[::17].reindex(index).ffill()
+    power = levels.set_axis([f"Device {i:03d}" for i in range(args.devices)], axis=1)
+    truth = power.to_numpy().sum() / 60 / 1000
+
+    step = DEFAULT_DATA_SAMPLING_MINUTE * 60
+    meters = {
+        f"{step:.0f} s, aligned": generate_meter_readings(power, step, 0, 0),
+        f"{args.interval_seconds:.0f} s": generate_meter_readings(
+            power, args.interval_seconds, 0, 0
+        ),
+        f"{args.interval_seconds:.0f} s, jitter and dropouts": generate_meter_readings(
+            power,
+            args.interval_seconds,
+            args.jitter_seconds,
+            args.dropout_rate,
+        ),
+    }
+    print(f"{args.devices} devices, {args.days} days, true usage {truth:,.2f} kWh")
+    print(f"{'meter':<32s} {'readings':>10s} {'kWh':>12s} {'error':>8s}")
+    for name, readings in meters.items():
+        kwh = get_kwh(readings)
+        print(
+            f"{name:<32s} {len(readings):10,d} {kwh:12,.2f} "
+            f"{(kwh - truth) / truth:8.2%}"
+        )
+
+    readings = list(meters.values())[-1]
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "data.csv"
+        to_csv_data(readings).to_csv(csv_path, index=False)
+        size = csv_path.stat().st_size
+        print(f"\nCSV of {len(readings):,} readings ({size / 2**20:.1f} MB)")
+        for name, block_size in [("whole file", size + 1), ("streamed", 8 * 2**20)]:
+            tracemalloc.start()
+            start = time.perf_counter()
+            source = read_csv_source(csv_path, os.stat(csv_path), block_size)
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(
+                f"{name:<12s} {seconds:6.2f}s, peak {peak / 2**20:7.1f} MB, "
+                f"{len(source.data):,} grid rows, "
+                f"{source.data['Energy (kWh)'].sum():,.2f} kWh"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+import pandas as pd
+
+from benchmark.synthetic import generate_synthetic_data
+from src.constants import DEFAULT_DATA_PATH
+from src.data.time_utils import get_date, get_minute_of_day
+
+
+def legacy_minute_of_day(datetimes: pd.Series) -> pd.Series:
+    return datetimes.apply(lambda x: x.minute + (x.hour * 60))
+
+
+def legacy_date(datetimes: pd.Series) -> pd.Series:
+    return datetimes.apply(
+        lambda x: x.replace(hour=0, minute=0, second=0, microsecond=0)
+    )
+
+
+def compare(name: str, datetimes: pd.Series) -> None:
+    for helper, legacy in [
+        (get_minute_of_day, legacy_minute_of_day),
+        (get_date, legacy_date),
+    ]:
+        start = time.perf_counter()
+        expected = legacy(datetimes)
+        legacy_time = time.perf_counter() - start
+        start = time.perf_counter()
+        result = helper(datetimes)
+        helper_time = time.perf_counter() - start
+        pd.testing.assert_series_equal(result, expected)
+        print(
+            f"{name} {helper.__name__:>17}: lambda {legacy_time:7.3f} s, "
+            f"vectorized {helper_time:7.4f} s, identical output"
+        )
+
+
+def main() -> None:
+    parser = ArgumentParser(
+        description="Check and time the vectorized datetime helpers against lambdas"
+    )
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH)
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    bundled = pd.read_csv(Path(args.data))
+    compare(
+        "bundled  ",
+        pd.to_datetime(bundled["Timestamp"], format="%Y-%m-%d %H:%M:%S"),
+    )
+    synthetic = generate_synthetic_data(args.devices, args.days)
+    compare("synthetic", synthetic["Datetime"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+READING_INTERVAL_SECONDS = 10 * 60
+
+
+async def post_reading(host: str, port: int, body: bytes) -> bool:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        # same request shape as edge/edge_app.ino, one connection per upload
+        writer.write(
+            b"POST /update HTTP/1.1\r\n"
+            + f"Host: {host}\r\n".encode()
+            + b"content-type: application/json\r\nConnection: close\r\n"
+            + f"Content-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+        return b"200 OK" in status_line
+    finally:
+        writer.close()
+
+
+async def run_device(
+    device_id: str,
+    host: str,
+    port: int,
+    period: float,
+    deadline: float,
+    latencies: List[float],
+    errors: List[int],
+) -> None:
+    await asyncio.sleep(random.uniform(0, period))
+    while (start := time.perf_counter()) < deadline:
+        body = json.dumps(
+            {
+                "Device ID": device_id,
+                "Voltage (V)": 220,
+                "Ampere (A)": round(random.uniform(0, 2), 3),
+                "Timestamp": str(int(time.time())),
+            }
+        ).encode()
+        try:
+            ok = await post_reading(host, port, body)
+        except OSError:
+            ok = False
+        latencies.append(time.perf_counter() - start)
+        if not ok:
+            errors.append(1)
+        await asyncio.sleep(max(0.0, period - (time.perf_counter() - start)))
+
+
+async def run_load(
+    host: str, port: int, devices: int, period: float, duration: float
+) -> None:
+    latencies: List[float] = []
+    errors: List[int] = []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(
+        *[
+            run_device(f"Device {i:05d}", host, port, period, deadline, latencies, errors)
+            for i in range(devices)
+        ]
+    )
+    elapsed = time.perf_counter() - start
+    rate = len(latencies) / elapsed
+    lat = np.array(latencies) * 1000
+    print(f"{len(latencies):,} requests in {elapsed:.1f} s, {len(errors)} failed")
+    print(f"throughput: {rate:,.1f} requests/s")
+    print(
+        f"latency ms: p50 {np.percentile(lat, 50):.2f}, "
+        f"p99 {np.percentile(lat, 99):.2f}, max {lat.max():.2f}"
+    )
+    print(
+        f"sustains {rate * READING_INTERVAL_SECONDS:,.0f} devices posting "
+        "every 10 minutes at this rate"
+    )
+
+
+def get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(host: str, port: int, timeout: float = 30) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError("Ingestion server did not start")
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Load test of the ingestion HTTP server")
+    parser.add_argument("--devices", type=int, default=5000)
+    parser.add_argument(
+        "--speedup",
+        type=float,
+        default=100,
+        help="Factor to shorten the 10 minutes upload interval of each device",
+    )
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=None,
+        help="Port of a running server, a temporary server is spawned if omitted",
+    )
+    args = parser.parse_args()
+
+    server: Optional[subprocess.Popen] = None
+    port = args.port
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if port is None:
+            port = get_free_port()
+            data_path = Path(tmp_dir) / "ingested.csv"
+            server = subprocess.Popen(
+                [
+                    sys.executable,
+                    "ingest_server.py",
+                    "--data",
+                    str(data_path),
+                    "--host",
+                    args.host,
+                    "--port",
+                    str(port),
+                ]
+            )
+        try:
+            wait_for_port(args.host, port)
+            period = READING_INTERVAL_SECONDS / args.speedup
+            print(f"{args.devices} devices, one upload every {period:.1f} s each")
+            asyncio.run(run_load(args.host, port, args.devices, period, args.duration))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+                with open(data_path) as f:
+                    print(f"rows written to storage: {sum(1 for _ in f) - 1:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import calendar
+import datetime
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser, Namespace
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+import pandas as pd
+from darts import TimeSeries
+
+from benchmark.synthetic import generate_synthetic_data, to_csv_data
+from src.constants import DEFAULT_DATA_SAMPLING_MINUTE
+from src.controller.forecast_utils import combine_past_and_future_daily_data
+from src.controller.historical_utils import get_df_of_historical_data
+from src.data.data_handler import (
+    DataHandler,
+    create_data_handler,
+    extract_daily_data,
+    extract_minutely_data,
+)
+from src.data.forecaster import LGBMForecaster, get_month_end_date
+from src.data.training import train_model
+
+
+@dataclass
+class StageResult:
+    stage: str
+    devices: int
+    months: int
+    gap_rate: float
+    rows: int
+    seconds: float
+    peak_mb: float
+
+
+def parse_size(size: str) -> Tuple[int, int]:
+    devices, months = size.lower().split("x")
+    return int(devices), int(months)
+
+
+def write_synthetic_months(
+    csv_path: Path, num_devices: int, num_months: int, gap_rate: float
+) -> int:
+    # written one month at a time to keep the generator memory small
+    num_rows = 0
+    for i in range(num_months):
+        year, month = 2024 + i // 12, i % 12 + 1
+        data = generate_synthetic_data(
+            num_devices,
+            calendar.monthrange(year, month)[1],
+            gap_rate,
+            start=datetime.date(year, month, 1).isoformat(),
+            seed=i,
+        )
+        to_csv_data(data).to_csv(csv_path, mode="a", header=i == 0, index=False)
+        num_rows += len(data)
+    return num_rows
+
+
+def measure(
+    func: Callable, setup: Callable[[], tuple], repeat: int
+) -> Tuple[float, float]:
+    best = float("inf")
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    # the peak memory is taken in a separate run since tracing slows down the stage
+    args = setup()
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 2**20
+
+
+def get_future_series(series: TimeSeries, num_days: int) -> TimeSeries:
+    # the last days of the month repeated after it stand in for a forecast
+    num_samples = min(len(series), num_days * 24 * 60 // DEFAULT_DATA_SAMPLING_MINUTE)
+    time_index = pd.date_range(
+        series.end_time() + series.freq,
+        periods=num_samples,
+        freq=series.freq,
+        name="Datetime",
+    )
+    return TimeSeries.from_times_and_values(
+        time_index,
+        series.values()[-num_samples:],
+        columns=series.components,
+    )
+
+
+def run_size(
+    num_devices: int, num_months: int, args: Namespace, tmp_dir: Path
+) -> List[StageResult]:
+    csv_path = tmp_dir / f"data-{num_devices}x{num_months}.csv"
+    num_rows = write_synthetic_months(csv_path, num_devices, num_months, args.gap_rate)
+    out: List[StageResult] = []
+
+    def add(stage: str, func: Callable, setup: Callable[[], tuple]) -> None:
+        seconds, peak_mb = measure(func, setup, args.repeat)
+        sizes = (num_devices, num_months, args.gap_rate, num_rows)
+        out.append(StageResult(stage, *sizes, seconds, peak_mb))
+        print(f"  {stage:<20s} {seconds:9.3f} s {peak_mb:9.1f} MB", flush=True)
+
+    add("load", DataHandler.load_data, lambda: (create_data_handler(csv_path),))
+
+    data = create_data_handler(csv_path)
+    data.load_data()
+    year, months = list(data.get_years_and_months().items())[-1]
+
+    def setup_month_switch() -> tuple:
+        # drop the built months so every run builds the month from the raw data
+        data._month_bundles.clear()
+        return (data, year, months[-1])
+
+    add("month_switch", DataHandler.set_year_and_month, setup_month_switch)
+    month_data = data.month_data
+    series = data.month_series_minutely
+    series_daily = data.month_series_daily
+    assert month_data is not None and series is not None and series_daily is not None
+    devices = list(series.components)
+
+    add("extract_minutely", extract_minutely_data, lambda: (month_data,))
+    add("extract_daily", extract_daily_data, lambda: (month_data,))
+    add(
+        "historical_df",
+        get_df_of_historical_data,
+        lambda: (series, ["All", *devices[:4]], False),
+    )
+    future = get_future_series(series, 7)
+    add(
+        "combine_daily",
+        combine_past_and_future_daily_data,
+        lambda: (future, series_daily, devices[0]),
+    )
+
+    if num_devices <= args.forecast_max_devices:
+        # a small model with the lags of the real model, the rollout cost depends on
+        # the number of devices and the horizon rather than on the number of trees
+        day_samples = 24 * 60 // DEFAULT_DATA_SAMPLING_MINUTE
+        model_path = tmp_dir / f"model-{num_devices}.pkl"
+        train_model([series[: 2 * day_samples]], args.forecast_rounds).save(
+            str(model_path)
+        )
+        forecaster = LGBMForecaster(model_path)
+        history = series[: len(series) // 2]
+        target_date = get_month_end_date(history.end_time().date())
+        add("lgbm_predict", forecaster.predict, lambda: (history, target_date))
+    return out
+
+
+def run(args: Namespace) -> None:
+    results: List[StageResult] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            num_devices, num_months = parse_size(size)
+            print(f"{num_devices} devices, {num_months} month(s)", flush=True)
+            results += run_size(num_devices, num_months, args, Path(tmp))
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "repeat": args.repeat,
+        "results": [asdict(r) for r in results],
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {len(results)} results to {args.output}")
+
+
+def read_results(path: Path) -> pd.DataFrame:
+    with open(path) as f:
+        results = pd.DataFrame(json.load(f)["results"])
+    return results.set_index(["stage", "devices", "months", "gap_rate"])
+
+
+def compare(args: Namespace) -> None:
+    base = read_results(args.base)
+    new = read_results(args.new)
+    report = base[["seconds", "peak_mb"]].join(
+        new[["seconds", "peak_mb"]], how="inner", lsuffix=" base", rsuffix=" new"
+    )
+    report["time ratio"] = report["seconds new"] / report["seconds base"]
+    report["memory ratio"] = report["peak_mb new"] / report["peak_mb base"]
+    limit = 1 + args.threshold
+    # stages of a few milliseconds are too noisy to be judged by the ratio alone
+    slower = report["seconds new"] - report["seconds base"] > args.min_seconds
+    report["regression"] = ((report["time ratio"] > limit) & slower) | (
+        report["memory ratio"] > limit
+    )
+    print(report.round(3).to_string())
+
+    num_regressions = int(report["regression"].sum())
+    if num_regressions > 0:
+        print(f"{num_regressions} stage(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+    print(f"No stage regressed by more than {args.threshold:.0%}")
+
+
+def main() -> None:
+    parser = ArgumentParser(
+        description="Time and memory profile the data and forecast stages on "
+        "synthetic data, or compare two saved runs"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the suite")
+    run_parser.add_argument(
+        "--sizes",
+        nargs="+",
+        default=["10x1", "50x3", "200x3"],
+        help="Sizes as <devices>x<months>",
+    )
+    run_parser.add_argument("--gap-rate", type=float, default=0.01)
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument(
+        "--forecast-max-devices",
+        type=int,
+        default=10,
+        help="The forecast stage trains a model per size, so it is skipped above this",
+    )
+    run_parser.add_argument("--forecast-rounds", type=int, default=10)
+    run_parser.add_argument("--output", type=Path, default=Path("bench_results.json"))
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two saved runs")
+    compare_parser.add_argument("base", type=Path)
+    compare_parser.add_argument("new", type=Path)
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Relative slowdown or memory growth reported as a regression",
+    )
+    compare_parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=0.01,
+        help="Slowdowns smaller than this are not reported as a regression",
+    )
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.constants import DEFAULT_DATA_SAMPLING_MINUTE
+from src.data.resampling import resample_readings
+
+
+def generate_synthetic_data(
+    num_devices: int,
+    num_days: int,
+    gap_rate: float = 0.0,
+    start: str = "2024-01-01",
+    sampling_minute: int = DEFAULT_DATA_SAMPLING_MINUTE,
+    seed: Optional[int] = 0,
+) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(
+        start, periods=num_days * 24 * 60 // sampling_minute, freq=f"{sampling_minute}min"
+    )
+    devices = np.array([f"Device {i:04d}" for i in range(num_devices)])
+    voltages = rng.choice([4.5, 12.0, 110.0, 220.0], size=num_devices)
+    minute_of_day = (times.hour * 60 + times.minute).to_numpy()
+    daily_profile = 1 + 0.5 * np.sin(2 * np.pi * minute_of_day / 1440)
+    amperes = rng.gamma(2.0, 0.25, size=(len(times), num_devices))
+    amperes *= daily_profile[:, None]
+
+    data = pd.DataFrame(
+        {
+            "Voltage (V)": np.tile(voltages, len(times)),
+            "Ampere (A)": amperes.reshape(-1).round(3),
+            "Datetime": np.repeat(times.to_numpy(), num_devices),
+            "Device ID": np.tile(devices, len(times)),
+        }
+    )
+    if gap_rate > 0:
+        data = data.loc[rng.random(len(data)) >= gap_rate].reset_index(drop=True)
+    return data
+
+
+def to_csv_data(data: pd.DataFrame) -> pd.DataFrame:
+    csv_data = data.loc[:, ["Voltage (V)", "Ampere (A)", "Datetime", "Device ID"]]
+    csv_data = csv_data.rename(columns={"Datetime": "Timestamp"})
+    csv_data["Timestamp"] = csv_data["Timestamp"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    return csv_data
+
+
+def to_month_data(data: pd.DataFrame) -> pd.DataFrame:
+    readings = data.loc[:, ["Datetime", "Device ID"]]
+    readings.insert(1, "Power (W)", data["Voltage (V)"] * data["Ampere (A)"])
+    readings["Device ID"] = readings["Device ID"].astype("category")
+    return resample_readings(readings)
@@ -0,0 +1,21 @@
+import asyncio
+
+from src.arg_parser import IngestArguments, parse_ingest_args
+from src.data.ingestion import create_reading_writer
+from src.ingestion.server import run_ingestion_server
+
+
+def main(args: IngestArguments) -> None:
+    asyncio.run(
+        run_ingestion_server(
+            create_reading_writer(args.data),
+            args.host,
+            args.port,
+            args.flush_rows,
+            args.flush_seconds,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main(parse_ingest_args())
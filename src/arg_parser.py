@@ -1,19 +1,63 @@
 from argparse import ArgumentParser
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, List, Optional, get_args
 
-from src.constants import DEFAULT_DATA_PATH, DEFAULT_MODEL_PATH
+from src.constants import (
+    DEFAULT_CACHE_MEMORY_MB,
+    DEFAULT_DATA_PATH,
+    DEFAULT_FORECAST_MODE,
+    DEFAULT_FORECAST_WORKERS,
+    DEFAULT_GAP_POLICY,
+    DEFAULT_INGEST_FLUSH_ROWS,
+    DEFAULT_INGEST_FLUSH_SECONDS,
+    DEFAULT_INGEST_HOST,
+    DEFAULT_INGEST_PORT,
+    DEFAULT_LIVE_REFRESH_SECONDS,
+    DEFAULT_METRICS_HOST,
+    DEFAULT_METRICS_PORT,
+    DEFAULT_MODEL_PATH,
+    DEFAULT_RETRAIN_ROUNDS,
+    DEFAULT_TRAIN_ROUNDS,
+    DEFAULT_VALIDATION_DAYS,
+    ForecastMode,
+    GapPolicy,
+)
 
 
 @dataclass
 class AppArguments:
     model: Path
     data: Path
+    gap_policy: GapPolicy
+    cache_memory_mb: int
+    forecast_mode: ForecastMode
+    forecast_workers: int
+    live_refresh_seconds: float
+    debug_panel: bool
+    trace_memory: bool
+    metrics_host: str
+    metrics_port: int
+    snapshot_dir: Optional[Path]
 
     @classmethod
     def from_args_parser(cls, parsed: Any) -> "AppArguments":
-        return cls(model=Path(parsed.model), data=Path(parsed.data))
+        return cls(
+            model=Path(parsed.model),
+            data=Path(parsed.data),
+            gap_policy=parsed.gap_policy,
+            cache_memory_mb=parsed.cache_memory_mb,
+            forecast_mode=parsed.forecast_mode,
+            forecast_workers=parsed.forecast_workers,
+            live_refresh_seconds=parsed.live_refresh_seconds,
+            debug_panel=parsed.debug_panel,
+            trace_memory=parsed.trace_memory,
+            metrics_host=parsed.metrics_host,
+            metrics_port=parsed.metrics_port,
+            snapshot_dir=(
+                None if parsed.snapshot_dir is None else Path(parsed.snapshot_dir)
+            ),
+        )
 
 
 def get_arg_parser() -> ArgumentParser:
@@ -28,10 +72,272 @@ def get_arg_parser() -> ArgumentParser:
     parser.add_argument(
         "--data",
         default=DEFAULT_DATA_PATH,
-        help=f"Path to the CSV file that contains the electricity usage data. Defaults to {DEFAULT_DATA_PATH}",
+        help=f"Path to the CSV file or the year/month partitioned directory that contains the electricity usage data, or to a directory of sites (site=<name>.csv files or site=<name> partitioned directories) to choose from. Defaults to {DEFAULT_DATA_PATH}",
+    )
+    parser.add_argument(
+        "--gap-policy",
+        default=DEFAULT_GAP_POLICY,
+        choices=get_args(GapPolicy),
+        help=f"How the steps of the 5-minute grid without readings of a device are filled. Defaults to {DEFAULT_GAP_POLICY}",
+    )
+    parser.add_argument(
+        "--cache-memory-mb",
+        type=int,
+        default=DEFAULT_CACHE_MEMORY_MB,
+        help=f"Memory limit of the data and model cache shared by all sessions. Defaults to {DEFAULT_CACHE_MEMORY_MB}",
+    )
+    parser.add_argument(
+        "--forecast-mode",
+        default=DEFAULT_FORECAST_MODE,
+        choices=get_args(ForecastMode),
+        help=f"Forecast with the single global model in-process through darts, with the same model rolled out by the native LightGBM boosters without the darts lag tables, or with independent models (a directory of per device group models in --model) in a process pool. Defaults to {DEFAULT_FORECAST_MODE}",
+    )
+    parser.add_argument(
+        "--forecast-workers",
+        type=int,
+        default=DEFAULT_FORECAST_WORKERS,
+        help=f"Number of worker processes of the parallel forecast mode. Defaults to {DEFAULT_FORECAST_WORKERS}",
+    )
+    parser.add_argument(
+        "--live-refresh-seconds",
+        type=float,
+        default=DEFAULT_LIVE_REFRESH_SECONDS,
+        help=f"Interval of the refresh of the current usage with the latest readings, disabled when 0. Defaults to {DEFAULT_LIVE_REFRESH_SECONDS}",
+    )
+    parser.add_argument(
+        "--debug-panel",
+        action="store_true",
+        help="Show the timings of the data, forecast and chart stages below the dashboard",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Also measure the peak memory of every stage with tracemalloc, which slows down the dashboard",
+    )
+    parser.add_argument(
+        "--metrics-host",
+        default=DEFAULT_METRICS_HOST,
+        help=f"Host address of the Prometheus metrics endpoint. Defaults to {DEFAULT_METRICS_HOST}",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=DEFAULT_METRICS_PORT,
+        help="Port of the Prometheus metrics endpoint (/metrics) with the stage timings, disabled when 0. Defaults to 0",
+    )
+    parser.add_argument(
+        "--snapshot-dir",
+        default=None,
+        help="Directory to keep the parsed data and the processed months in, so a restarted server does not parse the data again. Disabled by default",
     )
     return parser
 
 
 def parse_args() -> AppArguments:
     return AppArguments.from_args_parser(get_arg_parser().parse_args())
+
+
+@dataclass
+class IngestArguments:
+    data: Path
+    host: str
+    port: int
+    flush_rows: int
+    flush_seconds: float
+
+    @classmethod
+    def from_args_parser(cls, parsed: Any) -> "IngestArguments":
+        return cls(
+            data=Path(parsed.data),
+            host=parsed.host,
+            port=parsed.port,
+            flush_rows=parsed.flush_rows,
+            flush_seconds=parsed.flush_seconds,
+        )
+
+
+def get_ingest_arg_parser() -> ArgumentParser:
+    parser = ArgumentParser(
+        description="HTTP server that receives electricity readings from edge devices",
+    )
+    parser.add_argument(
+        "--data",
+        default=DEFAULT_DATA_PATH,
+        help=f"Path to the CSV file or the year/month partitioned directory to write the readings into. Defaults to {DEFAULT_DATA_PATH}",
+    )
+    parser.add_argument(
+        "--host",
+        default=DEFAULT_INGEST_HOST,
+        help=f"Host address to listen on. Defaults to {DEFAULT_INGEST_HOST}",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_INGEST_PORT,
+        help=f"Port to listen on. Defaults to {DEFAULT_INGEST_PORT}",
+    )
+    parser.add_argument(
+        "--flush-rows",
+        type=int,
+        default=DEFAULT_INGEST_FLUSH_ROWS,
+        help=f"Number of buffered readings that triggers a write to storage. Defaults to {DEFAULT_INGEST_FLUSH_ROWS}",
+    )
+    parser.add_argument(
+        "--flush-seconds",
+        type=float,
+        default=DEFAULT_INGEST_FLUSH_SECONDS,
+        help=f"Maximum seconds readings stay buffered before being written. Defaults to {DEFAULT_INGEST_FLUSH_SECONDS}",
+    )
+    return parser
+
+
+def parse_ingest_args() -> IngestArguments:
+    return IngestArguments.from_args_parser(get_ingest_arg_parser().parse_args())
+
+
+@dataclass
+class BatchArguments:
+    input_dir: Path
+    output: Path
+    model: Optional[Path]
+    price_per_kwh: float
+    workers: int
+    gap_policy: GapPolicy
+
+    @classmethod
+    def from_args_parser(cls, parsed: Any) -> "BatchArguments":
+        return cls(
+            input_dir=Path(parsed.input_dir),
+            output=Path(parsed.output),
+            model=None if parsed.skip_lgbm else Path(parsed.model),
+            price_per_kwh=parsed.price_per_kwh,
+            workers=parsed.workers,
+            gap_policy=parsed.gap_policy,
+        )
+
+
+def get_batch_arg_parser() -> ArgumentParser:
+    parser = ArgumentParser(
+        description="Write the month-end usage projection of every device of many data inputs",
+    )
+    parser.add_argument(
+        "input_dir",
+        help="Directory that contains the CSV files and/or year/month partitioned directories, one per meter",
+    )
+    parser.add_argument("output", help="Path of the CSV file to write the projections into")
+    parser.add_argument(
+        "--model",
+        default=DEFAULT_MODEL_PATH,
+        help=f"Path to the Dart LGBM model (.pkl) for minutely forecasting. Defaults to {DEFAULT_MODEL_PATH}",
+    )
+    parser.add_argument(
+        "--skip-lgbm",
+        action="store_true",
+        help="Only write the projection of the average forecaster",
+    )
+    parser.add_argument(
+        "--price-per-kwh",
+        type=float,
+        default=0.0,
+        help="Electricity rate per kWh used for the projected price. Defaults to 0",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_FORECAST_WORKERS,
+        help=f"Number of inputs processed in parallel. Defaults to {DEFAULT_FORECAST_WORKERS}",
+    )
+    parser.add_argument(
+        "--gap-policy",
+        default=DEFAULT_GAP_POLICY,
+        choices=get_args(GapPolicy),
+        help=f"How the steps of the 5-minute grid without readings of a device are filled. Defaults to {DEFAULT_GAP_POLICY}",
+    )
+    return parser
+
+
+def parse_batch_args() -> BatchArguments:
+    return BatchArguments.from_args_parser(get_batch_arg_parser().parse_args())
+
+
+@dataclass
+class TrainArguments:
+    data: Path
+    model: Path
+    retrain: bool
+    rounds: int
+    validation_days: int
+    gap_policy: GapPolicy
+    device_groups: Optional[List[List[str]]]
+
+    @classmethod
+    def from_args_parser(cls, parsed: Any) -> "TrainArguments":
+        rounds = parsed.rounds
+        if rounds is None:
+            rounds = DEFAULT_RETRAIN_ROUNDS if parsed.retrain else DEFAULT_TRAIN_ROUNDS
+        return cls(
+            data=Path(parsed.data),
+            model=Path(parsed.model),
+            retrain=parsed.retrain,
+            rounds=rounds,
+            validation_days=parsed.validation_days,
+            gap_policy=parsed.gap_policy,
+            device_groups=(
+                None
+                if parsed.device_groups is None
+                else [
+                    [d for d in group.split(",") if d]
+                    for group in parsed.device_groups
+                ]
+            ),
+        )
+
+
+def get_train_arg_parser() -> ArgumentParser:
+    parser = ArgumentParser(
+        description="Train the LGBM forecasting model, or continue training it on new data",
+    )
+    parser.add_argument(
+        "--data",
+        default=DEFAULT_DATA_PATH,
+        help=f"Path to the CSV file or the year/month partitioned directory to train on. Defaults to {DEFAULT_DATA_PATH}",
+    )
+    parser.add_argument(
+        "--model",
+        default=DEFAULT_MODEL_PATH,
+        help=f"Path of the active model (.pkl), which is replaced by the trained model. Versions are kept in the versions folder next to it. Defaults to {DEFAULT_MODEL_PATH}",
+    )
+    parser.add_argument(
+        "--retrain",
+        action="store_true",
+        help="Continue the boosting of the active model with the data that arrived after its last training instead of training from scratch",
+    )
+    parser.add_argument(
+        "--rounds",
+        type=int,
+        default=None,
+        help=f"Number of boosting rounds, or rounds added when retraining. Defaults to {DEFAULT_TRAIN_ROUNDS}, or {DEFAULT_RETRAIN_ROUNDS} when retraining",
+    )
+    parser.add_argument(
+        "--validation-days",
+        type=int,
+        default=DEFAULT_VALIDATION_DAYS,
+        help=f"Number of last days held out to evaluate the model. Defaults to {DEFAULT_VALIDATION_DAYS}",
+    )
+    parser.add_argument(
+        "--gap-policy",
+        default=DEFAULT_GAP_POLICY,
+        choices=get_args(GapPolicy),
+        help=f"How the steps of the 5-minute grid without readings of a device are filled. Defaults to {DEFAULT_GAP_POLICY}",
+    )
+    parser.add_argument(
+        "--device-groups",
+        nargs="+",
+        default=None,
+        help="Train one model per group of comma separated devices (e.g. AC,PC Lamp,TV) into the directory given in --model, for --forecast-mode parallel. A directory of group models is retrained with --retrain alone",
+    )
+    return parser
+
+
+def parse_train_args() -> TrainArguments:
+    return TrainArguments.from_args_parser(get_train_arg_parser().parse_args())
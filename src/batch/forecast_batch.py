@@ -0,0 +1,159 @@
+import csv
+import multiprocessing
+import sys
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+
+from src.constants import DEFAULT_GAP_POLICY, GapPolicy
+from src.controller.forecast_utils import calculate_forecasted_usage_data
+from src.data.data_handler import create_data_handler
+from src.data.forecaster import (
+    AverageForecaster,
+    get_month_end_date,
+    get_worker_forecaster,
+)
+from src.data.resampling import watts_to_kwh
+
+
+@dataclass
+class DeviceProjection:
+    input: str
+    year: int
+    month: int
+    device: str
+    last_datetime: str
+    usage_kwh: float
+    average_kwh: float
+    average_price: float
+    lgbm_kwh: Optional[float]
+    lgbm_price: Optional[float]
+
+
+def find_inputs(input_dir: Path) -> Iterator[Path]:
+    for path in sorted(input_dir.iterdir()):
+        if path.is_file() and path.suffix == ".csv":
+            yield path
+        elif path.is_dir() and any(path.glob("year=*")):
+            yield path
+
+
+def project_input(
+    data_path: Path,
+    model_path: Optional[Path],
+    price_per_kwh: float,
+    gap_policy: GapPolicy = DEFAULT_GAP_POLICY,
+) -> List[DeviceProjection]:
+    data = create_data_handler(data_path, price_per_kwh, gap_policy)
+    data.load_data()
+    years_and_months = data.get_years_and_months()
+    if len(years_and_months) <= 0:
+        return []
+    year = max(years_and_months.keys(), key=int)
+    data.set_year_and_month(year, years_and_months[year][-1])
+    if (
+        data.month_data_daily is None
+        or data.month_rollup is None
+        or data.month_series_minutely is None
+        or data.last_data_datetime is None
+    ):
+        return []
+
+    average = calculate_forecasted_usage_data(
+        AverageForecaster().fit(data.month_data_daily),
+        data.month_rollup,
+        data.last_data_datetime,
+        price_per_kwh,
+    )
+    if average is None:
+        return []
+    usage = data.month_rollup.total
+    lgbm_usage = None
+    if model_path is not None:
+        forecast = get_worker_forecaster(model_path).predict(
+            data.month_series_minutely,
+            get_month_end_date(data.last_data_datetime.date()),
+        )
+        if forecast is not None:
+            forecast_kwh = forecast.pd_dataframe().sum(axis=0)
+            forecast_kwh = watts_to_kwh(forecast_kwh, forecast.freq)
+            lgbm_usage = usage.add(forecast_kwh, fill_value=0)
+
+    out = []
+    for _, row in average.iterrows():
+        device = str(row["Device"])
+        lgbm_kwh = None if lgbm_usage is None else float(lgbm_usage.get(device, 0))
+        out.append(
+            DeviceProjection(
+                input=data_path.name,
+                year=int(year),
+                month=data.month,  # type: ignore
+                device=device,
+                last_datetime=data.last_data_datetime.isoformat(),
+                usage_kwh=float(usage.get(device, 0)),
+                average_kwh=float(row["Usage (kWh)"]),
+                average_price=float(row["Price (Rp)"]),
+                lgbm_kwh=lgbm_kwh,
+                lgbm_price=None if lgbm_kwh is None else lgbm_kwh * price_per_kwh,
+            )
+        )
+    return out
+
+
+def run_batch_forecast(
+    input_dir: Path,
+    output_path: Path,
+    model_path: Optional[Path],
+    price_per_kwh: float,
+    workers: int,
+    gap_policy: GapPolicy = DEFAULT_GAP_POLICY,
+) -> int:
+    num_failed = 0
+    with open(output_path, "w", newline="") as f:
+        columns = [x.name for x in fields(DeviceProjection)]
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        if workers <= 1:
+            for path in find_inputs(input_dir):
+                try:
+                    rows = project_input(path, model_path, price_per_kwh, gap_policy)
+                except Exception as e:
+                    print(f"{path.name}: {type(e).__name__}: {e}", file=sys.stderr)
+                    num_failed += 1
+                    continue
+                writer.writerows(asdict(r) for r in rows)
+                f.flush()
+            return num_failed
+
+        # at most two inputs per worker are in flight, the results are written as
+        # soon as they are done so neither the inputs nor the outputs pile up
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            pending: Set[Future] = set()
+            names: Dict[Future, str] = {}
+            inputs = find_inputs(input_dir)
+            while True:
+                for path in inputs:
+                    future = executor.submit(
+                        project_input, path, model_path, price_per_kwh, gap_policy
+                    )
+                    pending.add(future)
+                    names[future] = path.name
+                    if len(pending) >= 2 * workers:
+                        break
+                if len(pending) <= 0:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = names.pop(future)
+                    try:
+                        rows = future.result()
+                    except Exception as e:
+                        print(f"{name}: {type(e).__name__}: {e}", file=sys.stderr)
+                        num_failed += 1
+                        continue
+                    writer.writerows(asdict(r) for r in rows)
+                f.flush()
+    return num_failed
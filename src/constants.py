@@ -1,3 +1,32 @@
+from typing import Literal
+
+GapPolicy = Literal["nan", "zero", "ffill"]
+ForecastMode = Literal["global", "native", "parallel"]
+
 DEFAULT_MODEL_PATH = "model/lgbm_forecaster.pkl"
 DEFAULT_DATA_PATH = "dataset/appliance_data.csv"
 DEFAULT_DATA_SAMPLING_MINUTE = 5
+DEFAULT_GAP_POLICY: GapPolicy = "ffill"
+DEFAULT_CACHE_MEMORY_MB = 1024
+DEFAULT_MAX_CACHED_MONTHS = 4
+DEFAULT_FORECAST_REFRESH_SECONDS = 60
+DEFAULT_MAX_FORECAST_TARGETS = 8
+DEFAULT_SITE_INDEX_REFRESH_SECONDS = 60
+DEFAULT_FORECAST_MODE: ForecastMode = "global"
+DEFAULT_FORECAST_WORKERS = 4
+DEFAULT_INGEST_HOST = "0.0.0.0"
+DEFAULT_INGEST_PORT = 8080
+DEFAULT_INGEST_FLUSH_ROWS = 10_000
+DEFAULT_INGEST_FLUSH_SECONDS = 10.0
+DEFAULT_INGEST_MAX_BUFFER_ROWS = 1_000_000
+DEFAULT_CHART_MAX_POINTS = 1000
+MODEL_LAGS = 144
+MODEL_FUTURE_LAGS = (144, 12)
+MODEL_OUTPUT_CHUNK_LENGTH = 12
+DEFAULT_TRAIN_ROUNDS = 100
+DEFAULT_RETRAIN_ROUNDS = 10
+DEFAULT_VALIDATION_DAYS = 1
+DEFAULT_METRICS_HOST = "127.0.0.1"
+DEFAULT_METRICS_PORT = 0
+DEFAULT_RECENT_READINGS = 12
+DEFAULT_LIVE_REFRESH_SECONDS = 10
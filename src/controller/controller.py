@@ -1,36 +1,112 @@
+import datetime
+import tracemalloc
+from http.server import ThreadingHTTPServer
 from pathlib import Path
+from typing import Optional
 
 import streamlit as st
 
+from src.constants import ForecastMode, GapPolicy
+from src.controller.downsample_utils import prepare_chart_data
 from src.controller.forecast_utils import (
     calculate_forecasted_total_usage,
     calculate_forecasted_usage_data,
     calculate_total_forecast_series,
+    combine_past_and_future_daily_data,
     combine_past_and_future_data,
-    generate_daily_data_from_minutely,
 )
 from src.controller.historical_utils import (
     calculate_total_month_usage,
     get_df_of_historical_data,
     get_total_usage_per_device,
 )
-from src.data.data_handler import DataHandler
-from src.data.forecaster import AverageForecaster, LGBMForecaster
+from src.controller.range_utils import get_df_of_range_data
+from src.data.cache import SharedCache
+from src.data.data_handler import DataHandler, create_data_handler
+from src.data.forecast_engine import slice_forecast
+from src.data.forecast_scheduler import ForecastScheduler, WatchTarget
+from src.data.forecaster import AverageForecaster
+from src.data.site_index import SiteIndex, is_multi_site_store
+from src.instrumentation import RECORDER, instrumented, start_metrics_server
 from src.views import (
     view_data_selection,
+    view_debug,
     view_forecast_data,
     view_historical_data,
     view_live_data,
+    view_range_data,
 )
 
 
-def control_data_selection(data_path: Path) -> DataHandler:
-    if "data" not in st.session_state:
-        st.session_state["data"] = DataHandler(data_path)
-    data: DataHandler = st.session_state["data"]
+@st.cache_resource
+def get_shared_cache(max_memory_mb: int) -> SharedCache:
+    return SharedCache(max_memory_mb * 1024 * 1024)
+
+
+@st.cache_resource
+def get_forecast_scheduler(
+    model_path: Path,
+    forecast_mode: ForecastMode,
+    forecast_workers: int,
+    _cache: SharedCache,
+) -> ForecastScheduler:
+    return ForecastScheduler(
+        model_path, _cache, mode=forecast_mode, workers=forecast_workers
+    )
+
+
+@st.cache_resource
+def get_site_index(
+    data_path: Path,
+    gap_policy: GapPolicy,
+    snapshot_dir: Optional[Path],
+    _cache: SharedCache,
+) -> SiteIndex:
+    return SiteIndex(data_path, gap_policy, _cache, snapshot_dir)
+
+
+@st.cache_resource
+def get_metrics_server(host: str, port: int) -> ThreadingHTTPServer:
+    return start_metrics_server(host, port)
+
+
+def control_instrumentation(
+    trace_memory: bool, metrics_host: str, metrics_port: int
+) -> None:
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if metrics_port > 0:
+        get_metrics_server(metrics_host, metrics_port)
+
+
+def control_debug_panel() -> None:
+    view_debug.view_stage_timings(RECORDER.to_dataframe(), tracemalloc.is_tracing())
+
+
+@instrumented("controller.data_selection")
+def control_data_selection(
+    data_path: Path,
+    gap_policy: GapPolicy,
+    cache: SharedCache,
+    snapshot_dir: Optional[Path] = None,
+) -> DataHandler:
+    if is_multi_site_store(data_path):
+        data_path = control_site_selection(data_path, gap_policy, cache, snapshot_dir)
+    data: Optional[DataHandler] = st.session_state.get("data")
+    if data is None or data.data_path != data_path:
+        # a session only keeps the data of its selected site, the other sites are
+        # read again through the shared cache when they are selected
+        data = create_data_handler(
+            data_path, gap_policy=gap_policy, cache=cache, snapshot_dir=snapshot_dir
+        )
+        st.session_state["data"] = data
     data.load_data()
     price_per_kwh = view_data_selection.view_input_kwh()
     data.set_price_per_kwh(price_per_kwh)
+    if view_data_selection.view_range_mode_selection():
+        control_date_range_selection(data)
+        return data
+    data.clear_date_range()
     year_month = view_data_selection.view_year_month_selection(
         data.get_years_and_months()
     )
@@ -41,53 +117,124 @@ def control_data_selection(data_path: Path) -> DataHandler:
     return data
 
 
-def control_main_data(data: DataHandler, model_path: Path) -> None:
-    control_live_data(data)
+def control_site_selection(
+    data_path: Path,
+    gap_policy: GapPolicy,
+    cache: SharedCache,
+    snapshot_dir: Optional[Path],
+) -> Path:
+    site_index = get_site_index(data_path, gap_policy, snapshot_dir, cache)
+    site_index.refresh()
+    # the index may be refreshed by another session while the labels are built
+    sites = site_index.sites
+    site_labels = {}
+    for site, info in sites.items():
+        if info.start is None or info.end is None:
+            continue
+        site_labels[site] = (
+            f"{site} ({len(info.devices)} devices, "
+            f"{info.start:%d/%m/%Y} - {info.end:%d/%m/%Y})"
+        )
+    site = view_data_selection.view_site_selection(site_labels)
+    if site is None:
+        st.warning("The site has not been selected yet...")
+        st.stop()
+    return sites[site].path
+
+
+def control_date_range_selection(data: DataHandler) -> None:
+    data_range = data.get_data_range()
+    if data_range is None:
+        st.warning("The data have not been selected yet...")
+        st.stop()
+    date_range = view_data_selection.view_date_range_selection(
+        data_range[0].date(), (data_range[1] - datetime.timedelta(minutes=1)).date()
+    )
+    if date_range is None or data.price_per_kwh <= 0:
+        st.warning("The data have not been selected yet...")
+        st.stop()
+    start = datetime.datetime.combine(date_range[0], datetime.time())
+    end = datetime.datetime.combine(date_range[1], datetime.time())
+    data.set_date_range(start, end + datetime.timedelta(days=1))
+
+
+def control_main_data(
+    data: DataHandler,
+    model_path: Path,
+    forecast_mode: ForecastMode,
+    forecast_workers: int,
+    live_refresh_seconds: float,
+    cache: SharedCache,
+) -> None:
+    if data.date_range is not None:
+        control_range_data(data)
+        return
+    control_live_data(data, live_refresh_seconds)
     tab1, tab2 = st.tabs(["Historical", "Forecast"])
     with tab1:
         control_historical_data(data)
     with tab2:
-        control_forecast_data(data, model_path)
+        control_forecast_data(data, model_path, forecast_mode, forecast_workers, cache)
 
 
-def control_live_data(data: DataHandler) -> None:
-    if data.month_series_minutely is None:
+def control_live_data(data: DataHandler, refresh_seconds: float) -> None:
+    if refresh_seconds <= 0:
+        control_live_tile(data)
+        return
+    # only the tile reruns on the interval, the historical and forecast tabs are kept
+    st.experimental_fragment(run_every=refresh_seconds)(control_live_tile)(data)
+
+
+@instrumented("controller.live_data")
+def control_live_tile(data: DataHandler) -> None:
+    data.load_data()
+    if data.recent_readings is None or data.last_data_datetime is None:
         st.warning("Data has not been loaded...")
         return
-    current_total = data.month_series_minutely[-1].sum(axis=1).values()[0, 0]
-    previous_total = data.month_series_minutely[-2].sum(axis=1).values()[0, 0]
-    current_time = data.month_series_minutely[-1].time_index.to_pydatetime()[0]  # type: ignore
-    view_live_data.view_live_total(current_total, previous_total, current_time)
-    latest_data = data.month_series_minutely[-1].pd_dataframe().T.reset_index()
-    latest_data.columns = ["Device", "Power (W)"]
-    latest_data["Percentage (%)"] = latest_data["Power (W)"].apply(
-        lambda x: x * 100 / current_total
+    latest_data = data.recent_readings.get_reporting()["Power (W)"].dropna()
+    current_total = latest_data.sum()
+    previous_total = data.recent_readings.get_reporting(1)["Power (W)"].sum()
+    view_live_data.view_live_total(
+        current_total, previous_total, data.last_data_datetime
     )
+    latest_data = latest_data.reset_index()
+    latest_data["Percentage (%)"] = latest_data["Power (W)"] * 100 / current_total
     view_live_data.view_live_components(latest_data)
 
 
-def control_forecast_data(data: DataHandler, model_path: Path) -> None:
+@instrumented("controller.forecast_data")
+def control_forecast_data(
+    data: DataHandler,
+    model_path: Path,
+    forecast_mode: ForecastMode,
+    forecast_workers: int,
+    cache: SharedCache,
+) -> None:
     if (
         data.month_data_daily is None
         or data.month_series_daily is None
         or data.last_data_datetime is None
         or data.month_series_minutely is None
+        or data.month_rollup is None
+        or data.year is None
+        or data.month is None
     ):
         st.warning("Data has not been loaded...")
         return
 
-    if "avg_forecaster" not in st.session_state:
-        st.session_state["avg_forecaster"] = AverageForecaster().fit(
-            data.month_data_daily
-        )
-    avg_forecaster: AverageForecaster = st.session_state["avg_forecaster"]
-    if "min_forecaster" not in st.session_state:
-        st.session_state["min_forecaster"] = LGBMForecaster(model_path)
-    min_forecaster: LGBMForecaster = st.session_state["min_forecaster"]
+    scheduler = get_forecast_scheduler(
+        model_path, forecast_mode, forecast_workers, cache
+    )
+    target = WatchTarget(data.data_path, data.gap_policy, data.year, data.month)
+    completed = scheduler.watch(target)
+    if completed is None:
+        avg_forecaster = AverageForecaster().fit(data.month_data_daily)
+    else:
+        avg_forecaster = completed.average
 
     forecast_data = calculate_forecasted_usage_data(
         avg_forecaster,
-        data.month_series_daily,
+        data.month_rollup,
         data.last_data_datetime,
         data.price_per_kwh,
     )
@@ -104,13 +251,28 @@ def control_forecast_data(data: DataHandler, model_path: Path) -> None:
         data.last_data_datetime.date()
     )
     if do_inference:
-        st.session_state["forecasted"] = min_forecaster.predict(
-            data.month_series_minutely, forecast_days
-        )
-    if "forecasted" not in st.session_state:
+        st.session_state["forecast_until"] = forecast_days
+    if "forecast_until" not in st.session_state:
+        st.warning("No forecast have been made...")
+        return
+    if completed is None or completed.minutely is None:
+        error = scheduler.get_error(target)
+        if error is not None:
+            st.warning(f"Forecast failed: {error}")
+        else:
+            st.info("The forecast is being computed, please refresh in a moment...")
+        return
+    view_forecast_data.view_forecast_age(
+        completed.age, completed.month_key != data.month_key
+    )
+    forecasted = slice_forecast(
+        completed.minutely,
+        data.month_series_minutely.end_time(),  # type: ignore
+        st.session_state["forecast_until"],
+    )
+    if forecasted is None:
         st.warning("No forecast have been made...")
         return
-    forecasted = st.session_state["forecasted"]
 
     selected_device, is_daily = view_forecast_data.view_forecast_data_selection(
         data.month_series_minutely
@@ -121,25 +283,44 @@ def control_forecast_data(data: DataHandler, model_path: Path) -> None:
     if combined_data is None:
         st.warning("No device selected yet...")
         return
-    combined_data_daily = generate_daily_data_from_minutely(combined_data)
+    combined_data_daily = combine_past_and_future_daily_data(
+        forecasted, data.month_series_daily, selected_device
+    )
+    if combined_data_daily is None:
+        st.warning("No device selected yet...")
+        return
     view_forecast_data.view_monthly_summary_by_forecast(
         *calculate_total_forecast_series(combined_data_daily, data.price_per_kwh)
     )
+    if is_daily:
+        view_forecast_data.view_forecast_usage(combined_data_daily)
+        return
+    zoom = view_forecast_data.view_zoom_selection(
+        combined_data["Datetime"].min().to_pydatetime(),
+        combined_data["Datetime"].max().to_pydatetime(),
+    )
     view_forecast_data.view_forecast_usage(
-        combined_data_daily if is_daily else combined_data
+        prepare_chart_data(
+            combined_data, "Datetime", "Power (W)", ["Device", "source"], zoom
+        )
     )
 
 
+@instrumented("controller.historical_data")
 def control_historical_data(data: DataHandler) -> None:
-    if data.month_series_minutely is None or data.month_series_daily is None:
+    if (
+        data.month_series_minutely is None
+        or data.month_series_daily is None
+        or data.month_rollup is None
+    ):
         st.warning("No data selected yet...")
         return
 
     view_historical_data.view_monthly_summary(
-        *calculate_total_month_usage(data.month_series_daily, data.price_per_kwh)
+        *calculate_total_month_usage(data.month_rollup, data.price_per_kwh)
     )
     view_historical_data.view_device_portion(
-        get_total_usage_per_device(data.month_series_daily, data.price_per_kwh)
+        get_total_usage_per_device(data.month_rollup, data.price_per_kwh)
     )
 
     selected_devices, is_daily = view_historical_data.view_historical_data_selection(
@@ -153,4 +334,37 @@ def control_historical_data(data: DataHandler) -> None:
     if month_usage is None:
         st.warning("No device selected yet...")
         return
+    if not is_daily:
+        zoom = view_historical_data.view_zoom_selection(
+            month_usage["Datetime"].min().to_pydatetime(),
+            month_usage["Datetime"].max().to_pydatetime(),
+        )
+        month_usage = prepare_chart_data(
+            month_usage, "Datetime", "Power (W)", ["Device"], zoom
+        )
     view_historical_data.view_usage_of_the_month(month_usage, is_daily)
+
+
+@instrumented("controller.range_data")
+def control_range_data(data: DataHandler) -> None:
+    if data.range_rollup is None or data.date_range is None:
+        st.warning("No data in the selected range...")
+        return
+
+    start, end = data.date_range
+    view_range_data.view_range_summary(
+        *calculate_total_month_usage(data.range_rollup, data.price_per_kwh),
+        (start.date(), (end - datetime.timedelta(days=1)).date()),
+    )
+    view_historical_data.view_device_portion(
+        get_total_usage_per_device(data.range_rollup, data.price_per_kwh)
+    )
+
+    selected_devices, is_monthly = view_range_data.view_range_data_selection(
+        data.range_rollup.devices
+    )
+    range_usage = get_df_of_range_data(data.range_rollup, selected_devices, is_monthly)
+    if range_usage is None:
+        st.warning("No device selected yet...")
+        return
+    view_range_data.view_usage_of_the_range(range_usage, is_monthly)
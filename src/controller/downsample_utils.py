@@ -0,0 +1,72 @@
+import datetime
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.constants import DEFAULT_CHART_MAX_POINTS
+
+
+def get_lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    num = len(x)
+    if max_points >= num or max_points < 3:
+        return np.arange(num)
+    x = x.astype(np.float64)
+    y = np.nan_to_num(y.astype(np.float64))
+    # first and last points are kept, the rest is split into max_points - 2 buckets
+    edges = np.linspace(1, num - 1, max_points - 1).astype(np.int64)
+    edges = np.append(edges, num)
+    out = np.empty(max_points, dtype=np.int64)
+    out[0], out[-1] = 0, num - 1
+    selected = 0
+    for i in range(max_points - 2):
+        start, end, next_end = edges[i], edges[i + 1], edges[i + 2]
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[selected] - next_x) * (y[start:end] - y[selected])
+            - (x[selected] - x[start:end]) * (next_y - y[selected])
+        )
+        selected = start + int(area.argmax()) if end > start else selected
+        out[i + 1] = selected
+    return np.unique(out)
+
+
+def downsample_traces(
+    data: pd.DataFrame,
+    time_column: str,
+    value_column: str,
+    trace_columns: List[str],
+    max_points: int = DEFAULT_CHART_MAX_POINTS,
+) -> pd.DataFrame:
+    out = []
+    for _, trace in data.groupby(trace_columns, sort=False):
+        trace = trace.sort_values(time_column)
+        x = trace[time_column].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        y = trace[value_column].to_numpy(dtype=np.float64)
+        out.append(trace.iloc[get_lttb_indices(x, y, max_points)])
+    if len(out) <= 0:
+        return data
+    return pd.concat(out, axis=0)
+
+
+def filter_time_range(
+    data: pd.DataFrame, time_column: str, start: pd.Timestamp, end: pd.Timestamp
+) -> pd.DataFrame:
+    return data.loc[(data[time_column] >= start) & (data[time_column] <= end)]
+
+
+def prepare_chart_data(
+    data: pd.DataFrame,
+    time_column: str,
+    value_column: str,
+    trace_columns: List[str],
+    time_range: Tuple[datetime.datetime, datetime.datetime],
+    max_points: int = DEFAULT_CHART_MAX_POINTS,
+) -> pd.DataFrame:
+    zoomed = filter_time_range(
+        data, time_column, pd.Timestamp(time_range[0]), pd.Timestamp(time_range[1])
+    )
+    return downsample_traces(
+        zoomed, time_column, value_column, trace_columns, max_points
+    )
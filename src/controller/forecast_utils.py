@@ -1,15 +1,22 @@
+from __future__ import annotations
+
 import calendar
 import datetime
-from typing import Optional, Tuple
+from typing import TYPE_CHECKING, Optional, Tuple
 
 import pandas as pd
-from darts import TimeSeries
 
 from src.controller.historical_utils import (
     get_df_of_historical_data,
     get_total_usage_per_device,
 )
 from src.data.forecaster import AverageForecaster
+from src.data.resampling import watts_to_kwh
+from src.data.rollup import RollupIndex
+from src.data.time_utils import get_date
+
+if TYPE_CHECKING:
+    from darts import TimeSeries
 
 
 def get_days_remaining_of_the_month(current_date: datetime.datetime) -> float:
@@ -22,7 +29,7 @@ def get_days_remaining_of_the_month(current_date: datetime.datetime) -> float:
 
 def calculate_forecasted_usage_data(
     forecaster: AverageForecaster,
-    series_daily: TimeSeries,
+    month_rollup: RollupIndex,
     last_datetime: datetime.datetime,
     price_per_kwh: float,
 ) -> Optional[pd.DataFrame]:
@@ -32,16 +39,11 @@ def calculate_forecasted_usage_data(
     if forecasted_usage is None:
         return None
 
-    forecast_df = pd.DataFrame(columns=["Device", "Usage (kWh)"])
-    for _, row in get_total_usage_per_device(series_daily, price_per_kwh).iterrows():
-        device = str(row["Device"])
-        if device not in forecasted_usage:
-            continue
-        new_row = {
-            "Device": device,
-            "Usage (kWh)": forecasted_usage[device] + row["Usage (kWh)"],
-        }
-        forecast_df = pd.concat([forecast_df, pd.DataFrame.from_records([new_row])])
+    forecast_df = get_total_usage_per_device(month_rollup, price_per_kwh)
+    forecast_df["Device"] = forecast_df["Device"].astype(str)
+    forecast_df = forecast_df.loc[forecast_df["Device"].isin(forecasted_usage.index)]
+    forecast_df = forecast_df.loc[:, ["Device", "Usage (kWh)"]].reset_index(drop=True)
+    forecast_df["Usage (kWh)"] += forecasted_usage.loc[forecast_df["Device"]].to_numpy()
     forecast_df["Price (Rp)"] = forecast_df["Usage (kWh)"] * price_per_kwh
     return forecast_df
 
@@ -71,26 +73,24 @@ def combine_past_and_future_data(
     return pd.concat([past_df, future_df], axis=0)
 
 
-def generate_daily_data_from_minutely(minutely_data: pd.DataFrame):
-    daily_data = minutely_data.copy()
-    daily_data["Date"] = daily_data["Datetime"].apply(
-        lambda x: x.replace(hour=0, minute=0, second=0, microsecond=0)
-    )
-    all_data = []
-    for _, dev_data in daily_data.groupby("Device", as_index=False):
-        dev_agg = dev_data.groupby("Date", as_index=False).aggregate(
-            {"Power (W)": "sum", "source": "last"}
-        )
-        all_data.append(dev_agg)
-    daily_data = pd.concat(all_data, axis=0)
-    daily_data["Usage (kWh)"] = daily_data["Power (W)"] * 5 / 60 / 1000
-    del daily_data["Power (W)"]
-    last_past_data = daily_data.loc[daily_data["source"] == "Historical", :].iloc[-1, :]
-    last_past_data["source"] = "Forecast"
-    daily_data = pd.concat(
-        [daily_data, last_past_data.to_frame().T], axis=0
-    ).sort_values("Date")
-    return daily_data
+def combine_past_and_future_daily_data(
+    future_series: TimeSeries, past_daily: TimeSeries, selected_device: Optional[str]
+) -> Optional[pd.DataFrame]:
+    if selected_device is None:
+        return None
+    past_df = get_df_of_historical_data(past_daily, [selected_device], True)
+    future_df = get_df_of_historical_data(future_series, [selected_device], False)
+    if past_df is None or future_df is None:
+        return None
+    future_df["Date"] = get_date(future_df["Datetime"])
+    future_df = future_df.groupby(["Date", "Device"], as_index=False)["Power (W)"].sum()
+    future_df["Usage (kWh)"] = watts_to_kwh(future_df["Power (W)"], future_series.freq)
+    del future_df["Power (W)"]
+    past_df["source"] = "Historical"
+    future_df["source"] = "Forecast"
+    # repeat the last historical day as forecast so both lines are connected
+    last_past_data = past_df.iloc[[-1], :].assign(source="Forecast")
+    return pd.concat([past_df, future_df, last_past_data], axis=0).sort_values("Date")
 
 
 def calculate_total_forecast_series(
@@ -1,8 +1,14 @@
+from __future__ import annotations
+
 from copy import deepcopy
-from typing import List, Optional, Tuple
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
 import pandas as pd
-from darts import TimeSeries
+
+from src.data.rollup import RollupIndex
+
+if TYPE_CHECKING:
+    from darts import TimeSeries
 
 
 def get_df_of_historical_data(
@@ -39,17 +45,17 @@ def get_df_of_historical_data(
 
 
 def calculate_total_month_usage(
-    daily_data: TimeSeries, price_per_kwh: float
+    month_rollup: RollupIndex, price_per_kwh: float
 ) -> Tuple[float, float]:
-    total_kwh = daily_data.sum(axis=1).sum(axis=0).values()[0, 0]
+    total_kwh = float(month_rollup.total.sum())
     total_price = total_kwh * price_per_kwh
     return total_kwh, total_price
 
 
 def get_total_usage_per_device(
-    series: TimeSeries, price_per_kwh: float
+    month_rollup: RollupIndex, price_per_kwh: float
 ) -> pd.DataFrame:
-    total_data = series.sum(axis=0).pd_dataframe().transpose().reset_index()
+    total_data = month_rollup.total.rename_axis("Device").reset_index()
     total_data.columns = ["Device", "Usage (kWh)"]
     total_data["Price (Rp)"] = total_data["Usage (kWh)"] * price_per_kwh
     return total_data
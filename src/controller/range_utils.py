@@ -0,0 +1,21 @@
+from typing import List, Optional
+
+import pandas as pd
+
+from src.data.rollup import RollupIndex
+
+
+def get_df_of_range_data(
+    rollup: RollupIndex, selected_devices: List[str], is_monthly: bool
+) -> Optional[pd.DataFrame]:
+    if len(selected_devices) <= 0:
+        return None
+    usage = rollup.monthly if is_monthly else rollup.daily
+    usage = usage.assign(All=usage.sum(axis=1, min_count=1))
+    devices = [d for d in ["All", *rollup.devices] if d in selected_devices]
+    return (
+        usage.loc[:, devices]
+        .rename_axis("Date")
+        .reset_index()
+        .melt(id_vars="Date", var_name="Device", value_name="Usage (kWh)")
+    )
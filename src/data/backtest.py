@@ -0,0 +1,229 @@
+import datetime
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from darts import TimeSeries, concatenate
+
+from src.constants import (
+    DEFAULT_DATA_SAMPLING_MINUTE,
+    DEFAULT_GAP_POLICY,
+    MODEL_LAGS,
+    GapPolicy,
+)
+from src.data.data_handler import create_data_handler, get_months_in_range
+from src.data.forecaster import (
+    AverageForecaster,
+    LGBMForecaster,
+    get_minute_covariates,
+)
+from src.data.resampling import watts_to_kwh
+
+
+# The energy usage (kWh) of every device in the horizon after each forecast origin,
+# together with the wall time that was spent on each forecast.
+@dataclass(frozen=True)
+class BacktestResult:
+    name: str
+    actual_kwh: pd.DataFrame
+    predicted_kwh: pd.DataFrame
+    latencies: np.ndarray
+
+    @property
+    def num_forecasts(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def elapsed(self) -> float:
+        return float(self.latencies.sum())
+
+    @property
+    def throughput(self) -> float:
+        if self.elapsed <= 0:
+            return 0
+        return self.num_forecasts / self.elapsed
+
+    def get_device_errors(self) -> pd.DataFrame:
+        actual = self.actual_kwh.assign(All=self.actual_kwh.sum(axis=1))
+        predicted = self.predicted_kwh.assign(All=self.predicted_kwh.sum(axis=1))
+        error = (predicted - actual).abs()
+        out = pd.DataFrame(
+            {
+                "Actual (kWh)": actual.mean(),
+                "Predicted (kWh)": predicted.mean(),
+                "kWh MAE": error.mean(),
+            }
+        )
+        out["kWh Err (%)"] = out["kWh MAE"] / out["Actual (kWh)"] * 100
+        return out.rename_axis("Device")
+
+
+def load_backtest_series(
+    data_path: Path,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    gap_policy: GapPolicy = DEFAULT_GAP_POLICY,
+) -> List[TimeSeries]:
+    data = create_data_handler(data_path, gap_policy=gap_policy)
+    data.load_data()
+    data_range = data.get_data_range()
+    if data_range is None:
+        return []
+    # the origins at the start of the range need the lags of the month before it
+    history = datetime.timedelta(minutes=MODEL_LAGS * DEFAULT_DATA_SAMPLING_MINUTE)
+    start = data_range[0] if start is None else max(start - history, data_range[0])
+    end = data_range[1] if end is None else min(end, data_range[1])
+    segments: List[TimeSeries] = []
+    for year, month in get_months_in_range(start, end):
+        series = data.get_month_series(year, month)
+        if series is None:
+            continue
+        # consecutive months with the same devices are joined into one segment
+        if (
+            len(segments) > 0
+            and segments[-1].end_time() + series.freq == series.start_time()
+            and list(segments[-1].components) == list(series.components)
+        ):
+            segments[-1] = concatenate([segments[-1], series], axis=0)
+        else:
+            segments.append(series)
+    return segments
+
+
+def get_origin_indices(
+    series: TimeSeries,
+    horizon_samples: int,
+    stride_samples: int,
+    start: Optional[datetime.datetime],
+    end: Optional[datetime.datetime],
+) -> np.ndarray:
+    time_index = series.time_index
+    # the LGBM needs its lags and the average needs a full day before the origin
+    min_history = max(MODEL_LAGS, 24 * 60 // DEFAULT_DATA_SAMPLING_MINUTE)
+    first = min_history
+    if start is not None:
+        first = max(first, int(time_index.searchsorted(pd.Timestamp(start))))
+    last = len(series) - horizon_samples
+    if end is not None:
+        last = min(last, int(time_index.searchsorted(pd.Timestamp(end))) - 1)
+    return np.arange(first, last + 1, stride_samples)
+
+
+def get_horizon_kwh(
+    series: TimeSeries, origins: np.ndarray, horizon_samples: int
+) -> pd.DataFrame:
+    values = series.values(copy=False)
+    cumsum = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+    watt_samples = cumsum[origins + horizon_samples] - cumsum[origins]
+    return pd.DataFrame(
+        watts_to_kwh(watt_samples, series.freq),
+        index=series.time_index[origins],
+        columns=list(series.components),
+    )
+
+
+def backtest_lgbm(
+    forecaster: LGBMForecaster,
+    segments: List[TimeSeries],
+    horizon_samples: int,
+    stride_samples: int,
+    start: Optional[datetime.datetime],
+    end: Optional[datetime.datetime],
+    batch_size: int,
+) -> Optional[BacktestResult]:
+    actual, predicted, latencies = [], [], []
+    output_chunk_length = forecaster.model.output_chunk_length
+    for series in segments:
+        origins = get_origin_indices(
+            series, horizon_samples, stride_samples, start, end
+        )
+        if len(origins) <= 0:
+            continue
+        actual.append(get_horizon_kwh(series, origins, horizon_samples))
+
+        if horizon_samples <= output_chunk_length:
+            # darts builds the lag table of the whole segment once and predicts every
+            # origin from it, without any autoregressive step
+            begin = time.perf_counter()
+            forecasts = forecaster.model.historical_forecasts(
+                series=series,
+                future_covariates=get_minute_covariates(series, 0),
+                start=series.time_index[origins[0]],
+                forecast_horizon=horizon_samples,
+                stride=stride_samples,
+                retrain=False,
+                last_points_only=False,
+                overlap_end=False,
+            )
+            elapsed = time.perf_counter() - begin
+            forecasts = forecasts[: len(origins)]  # type: ignore
+            latencies.append(np.full(len(origins), elapsed / len(origins)))
+        else:
+            # the origins of a batch share the lag table of every autoregressive step
+            forecasts = []
+            for i in range(0, len(origins), batch_size):
+                batch = origins[i : i + batch_size]
+                begin = time.perf_counter()
+                forecasts += forecaster.predict_samples(
+                    [series[:o] for o in batch], horizon_samples
+                )
+                elapsed = time.perf_counter() - begin
+                latencies.append(np.full(len(batch), elapsed / len(batch)))
+
+        total = np.stack([f.values(copy=False).sum(axis=0) for f in forecasts])
+        predicted.append(
+            pd.DataFrame(
+                watts_to_kwh(total, series.freq),
+                index=series.time_index[origins],
+                columns=list(series.components),
+            )
+        )
+    if len(actual) <= 0:
+        return None
+    return BacktestResult(
+        "LGBM", pd.concat(actual), pd.concat(predicted), np.concatenate(latencies)
+    )
+
+
+def backtest_average(
+    segments: List[TimeSeries],
+    horizon_samples: int,
+    stride_samples: int,
+    start: Optional[datetime.datetime],
+    end: Optional[datetime.datetime],
+    history_days: int,
+) -> Optional[BacktestResult]:
+    actual, predicted, latencies = [], [], []
+    for series in segments:
+        step = pd.Timedelta(series.freq)
+        horizon_days = horizon_samples * step / pd.Timedelta(days=1)
+        origins = get_origin_indices(
+            series, horizon_samples, stride_samples, start, end
+        )
+        if len(origins) <= 0:
+            continue
+        actual.append(get_horizon_kwh(series, origins, horizon_samples))
+        daily = series.pd_dataframe().resample("D").sum()
+        daily = watts_to_kwh(daily, series.freq)
+
+        rows = []
+        for origin in series.time_index[origins]:
+            begin = time.perf_counter()
+            # only the full days before the origin are known at the origin
+            cutoff = origin.normalize()
+            history = daily.loc[
+                (daily.index >= cutoff - pd.Timedelta(days=history_days))
+                & (daily.index < cutoff)
+            ]
+            forecast = AverageForecaster().fit(history).predict(horizon_days)
+            latencies.append(time.perf_counter() - begin)
+            rows.append(forecast.drop("All"))  # type: ignore
+        predicted.append(pd.DataFrame(rows, index=series.time_index[origins]))
+    if len(actual) <= 0:
+        return None
+    return BacktestResult(
+        "Average", pd.concat(actual), pd.concat(predicted), np.array(latencies)
+    )
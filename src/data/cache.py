@@ -0,0 +1,92 @@
+import dataclasses
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+import numpy as np
+import pandas as pd
+
+T = TypeVar("T")
+_MISSING = object()
+
+
+def estimate_size(obj: Any) -> int:
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if hasattr(obj, "all_values"):
+        # darts TimeSeries, measured by its underlying values array
+        return obj.all_values(copy=False).nbytes
+    if isinstance(obj, (list, tuple)):
+        return sum(estimate_size(o) for o in obj)
+    if isinstance(obj, dict):
+        return sum(estimate_size(o) for o in obj.values())
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return sum(estimate_size(getattr(obj, f.name)) for f in dataclasses.fields(obj))
+    return sys.getsizeof(obj)
+
+
+# Thread-safe LRU cache bounded by the estimated memory of its values. One instance
+# is shared by all Streamlit sessions, so the cached values must be kept read-only.
+class SharedCache:
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self._get(key)
+        return None if value is _MISSING else value
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None) -> None:
+        if size is None:
+            size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def get_or_create(
+        self, key: Hashable, factory: Callable[[], T], size: Optional[int] = None
+    ) -> T:
+        value = self._get(key, count=False)
+        if value is not _MISSING:
+            with self._lock:
+                self.hits += 1
+            return value
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # sessions asking for the same missing key wait for a single computation
+        with key_lock:
+            value = self._get(key)
+            if value is _MISSING:
+                value = factory()
+                self.put(key, value, size)
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return value
+
+    def _get(self, key: Hashable, count: bool = True) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += count
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += count
+            return self._entries[key][0]
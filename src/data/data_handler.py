@@ -1,54 +1,319 @@
+from __future__ import annotations
+
 import calendar
 import datetime
+import io
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import (
+    TYPE_CHECKING,
+    BinaryIO,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
 
+import numpy as np
 import pandas as pd
-from darts import TimeSeries
-
-
-def extract_minutely_data(month_data: pd.DataFrame) -> Tuple[pd.DataFrame, TimeSeries]:
-    pivot_data = []
-    for dev_id, d in month_data.groupby("Device ID"):
-        assert isinstance(d, pd.DataFrame)
-        del d["Device ID"]
-        d = d.rename(columns={"Power (W)": dev_id})
-        pivot_data.append(d)
-    data_min_df = pivot_data[0]
-    for d in pivot_data[1:]:
-        data_min_df = pd.merge(data_min_df, d)
-    data_min_series = TimeSeries.from_dataframe(
-        data_min_df,
-        time_col="Datetime",
-        value_cols=[c for c in data_min_df.columns if c not in ["Datetime"]],
-    )
+
+from src.constants import (
+    DEFAULT_DATA_SAMPLING_MINUTE,
+    DEFAULT_GAP_POLICY,
+    DEFAULT_MAX_CACHED_MONTHS,
+    GapPolicy,
+)
+from src.data.cache import SharedCache
+from src.data.recent_readings import RecentReadings
+from src.data.resampling import ReadingResampler, combine_grid_rows, merge_grid
+from src.data.rollup import RollupIndex, build_rollup, concat_rollups, merge_rollups
+from src.data.snapshot import SnapshotStore
+from src.instrumentation import instrumented, timed_stage
+
+if TYPE_CHECKING:
+    from darts import TimeSeries
+
+T = TypeVar("T")
+
+
+@instrumented("data.extract_minutely")
+def extract_minutely_data(
+    month_data: pd.DataFrame,
+    gap_policy: GapPolicy = DEFAULT_GAP_POLICY,
+    sampling_minute: int = DEFAULT_DATA_SAMPLING_MINUTE,
+) -> Tuple[pd.DataFrame, TimeSeries]:
+    step = pd.Timedelta(minutes=sampling_minute)
+    times = month_data["Datetime"].to_numpy(dtype="datetime64[ns]")
+    start = pd.Timestamp(times.min()).floor(step)
+    time_idx = (times - start.to_datetime64()) // step.to_timedelta64()
+    device_idx, devices = pd.factorize(month_data["Device ID"], sort=True)
+
+    values = month_data["Power (W)"].to_numpy()
+    dtype = values.dtype if np.issubdtype(values.dtype, np.floating) else np.float64
+    block = np.full((time_idx.max() + 1, len(devices)), np.nan, dtype=dtype)
+    block[time_idx, device_idx] = values
+    if gap_policy == "zero":
+        block[np.isnan(block)] = 0
+    elif gap_policy == "ffill":
+        block = pd.DataFrame(block).ffill().to_numpy()
+
+    time_index = pd.date_range(start, periods=len(block), freq=step, name="Datetime")
+    columns = [str(d) for d in devices]
+    data_min_df = pd.DataFrame(block, columns=columns)
+    data_min_df.insert(0, "Datetime", time_index)
+    with timed_stage("darts.timeseries"):
+        from darts import TimeSeries
+
+        data_min_series = TimeSeries.from_times_and_values(
+            time_index, block, columns=columns
+        )
     return data_min_df, data_min_series
 
 
 def extract_daily_data(month_data: pd.DataFrame) -> Tuple[pd.DataFrame, TimeSeries]:
-    data_daily_df = month_data.copy()
-    data_daily_df["Date"] = data_daily_df["Datetime"].apply(
-        lambda x: x.replace(hour=0, minute=0, second=0, microsecond=0)
-    )
-    data_daily_df = data_daily_df.groupby(
-        [data_daily_df["Date"], "Device ID"]
-    ).aggregate({"Power (W)": "sum"})
-    data_daily_df["Power (W)"] = data_daily_df["Power (W)"] * 5 / 60 / 1000
-    data_daily_df = data_daily_df.unstack().reset_index()
-    data_daily_df.columns = [
-        " ".join(col[::-1]).strip().replace(" Power (W)", "")
-        for col in data_daily_df.columns.values
-    ]
+    return extract_daily_data_from_rollup(build_rollup(month_data))
+
+
+@instrumented("data.extract_daily")
+def extract_daily_data_from_rollup(
+    rollup: RollupIndex,
+) -> Tuple[pd.DataFrame, TimeSeries]:
+    from darts import TimeSeries
+
+    data_daily_df = rollup.daily.rename_axis("Date").reset_index()
     data_daily_series = TimeSeries.from_dataframe(data_daily_df, time_col="Date")
     return data_daily_df, data_daily_series
 
 
+def get_year_months(datetimes: pd.Series) -> List[Tuple[int, int]]:
+    year_months = pd.unique(datetimes.dt.year * 100 + datetimes.dt.month)
+    return [(int(ym) // 100, int(ym) % 100) for ym in year_months]
+
+
+def get_months_in_range(
+    start: datetime.datetime, end: datetime.datetime
+) -> List[Tuple[int, int]]:
+    months = pd.period_range(pd.Timestamp(start), pd.Timestamp(end), freq="M")
+    if pd.Timestamp(end) == months[-1].start_time:
+        months = months[:-1]
+    return [(m.year, m.month) for m in months]
+
+
+def prepare_raw_data(data: pd.DataFrame) -> pd.DataFrame:
+    data["Power (W)"] = data["Voltage (V)"] * data["Ampere (A)"]
+    timestamps = data.pop("Timestamp")
+    data["Datetime"] = pd.to_datetime(timestamps, format="%Y-%m-%d %H:%M:%S")
+    return data
+
+
+# number of bytes before the parsed offset that are compared to detect rewrites
+SOURCE_SIGNATURE_SIZE = 256
+# a CSV source is parsed in blocks of this many bytes, so it is never held whole
+CSV_BLOCK_SIZE = 64 * 2**20
+# a last line without a line break is parsed once the file was not modified for this
+# long, before that the writer may still be in the middle of it
+CSV_TAIL_SETTLE_NS = 2 * 10**9
+# the source snapshot is rewritten once the rows appended since reach this fraction
+SNAPSHOT_REWRITE_GROWTH = 0.25
+CSV_DTYPES = {
+    "Voltage (V)": "float32",
+    "Ampere (A)": "float32",
+    "Timestamp": "str",
+    "Device ID": "category",
+}
+
+
+def parse_csv_rows(raw: bytes, columns: List[str]) -> pd.DataFrame:
+    data = pd.read_csv(io.BytesIO(raw), header=None, names=columns, dtype=CSV_DTYPES)
+    return prepare_raw_data(data)
+
+
+def iter_csv_blocks(
+    f: BinaryIO, size: int, block_size: int = CSV_BLOCK_SIZE, parse_tail: bool = False
+) -> Iterator[bytes]:
+    # every block ends at a line break, the last line until the given file size is
+    # only yielded without one if it is settled, otherwise it is left to the next
+    # read of the appended rows
+    rest = b""
+    remaining = size - f.tell()
+    while remaining > 0 and len(block := f.read(min(block_size, remaining))) > 0:
+        remaining -= len(block)
+        block = rest + block
+        end = block.rfind(b"\n") + 1
+        rest = block[end:]
+        if end > 0:
+            yield block[:end]
+    if parse_tail and len(rest) > 0:
+        yield rest
+
+
+def is_csv_tail_settled(data_path: Path, stat: os.stat_result) -> bool:
+    if stat.st_size <= 0 or time.time_ns() - stat.st_mtime_ns < CSV_TAIL_SETTLE_NS:
+        return False
+    with open(data_path, "rb") as f:
+        f.seek(stat.st_size - 1)
+        return f.read(1) != b"\n"
+
+
+# The readings of a CSV file resampled to the grid of the model, with the energy of
+# every grid step and device integrated over time, see ReadingResampler.
+@dataclass(frozen=True)
+class CsvSource:
+    data: pd.DataFrame
+    size: int
+    mtime_ns: int
+    offset: int
+    header: bytes
+    signature: bytes
+    columns: List[str]
+    # (size, mtime) of the last full read, and the parsed offset of the last append
+    # of every month since, which is the same in every process that read the file
+    generation: Tuple[int, int]
+    rollup: RollupIndex
+    recent: RecentReadings
+    resampler: ReadingResampler
+    month_revisions: Dict[Tuple[int, int], int] = field(default_factory=dict)
+    # parsed offset of the snapshot of the source, when it is saved
+    snapshot_offset: int = 0
+
+
+@dataclass(frozen=True)
+class MonthBundle:
+    month_data: pd.DataFrame
+    data_minutely: pd.DataFrame
+    series_minutely: TimeSeries
+    data_daily: pd.DataFrame
+    series_daily: TimeSeries
+    rollup: RollupIndex
+
+
+@instrumented("data.read_csv")
+def read_csv_source(
+    data_path: Path,
+    stat: os.stat_result,
+    block_size: int = CSV_BLOCK_SIZE,
+    parse_tail: bool = False,
+) -> CsvSource:
+    resampler = ReadingResampler.empty()
+    recent = RecentReadings.empty()
+    frames = []
+    with open(data_path, "rb") as f:
+        header = f.readline()
+        columns = list(pd.read_csv(io.BytesIO(header), nrows=0).columns)
+        offset = len(header)
+        for raw in iter_csv_blocks(f, stat.st_size, block_size, parse_tail):
+            readings = parse_csv_rows(raw, columns)
+            rows, resampler = resampler.extend(readings)
+            frames.append(rows)
+            recent = recent.extend(readings)
+            offset += len(raw)
+        f.seek(max(offset - SOURCE_SIGNATURE_SIZE, 0))
+        signature = f.read(offset - f.tell())
+    data = combine_grid_rows(frames)
+    return CsvSource(
+        data=data,
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        offset=offset,
+        header=header,
+        signature=signature,
+        columns=columns,
+        generation=(stat.st_size, stat.st_mtime_ns),
+        rollup=build_rollup(data),
+        recent=recent,
+        resampler=resampler,
+    )
+
+
+@instrumented("data.read_csv_append")
+def read_appended_csv_source(
+    data_path: Path, source: CsvSource, stat: os.stat_result, parse_tail: bool = False
+) -> CsvSource:
+    with open(data_path, "rb") as f:
+        f.seek(source.offset)
+        raw = b"".join(iter_csv_blocks(f, stat.st_size, parse_tail=parse_tail))
+    data = source.data
+    rollup = source.rollup
+    recent = source.recent
+    resampler = source.resampler
+    month_revisions = source.month_revisions
+    if len(raw) > 0:
+        readings = parse_csv_rows(raw, source.columns)
+        if len(readings) > 0:
+            rows, resampler = resampler.extend(readings)
+            data = merge_grid(data, rows)
+            rollup = merge_rollups(rollup, build_rollup(rows))
+            recent = recent.extend(readings)
+            month_revisions = dict(month_revisions)
+            # the rows also correct the last grid steps of the previous readings
+            for year_month in get_year_months(rows["Datetime"]):
+                month_revisions[year_month] = source.offset + len(raw)
+    return replace(
+        source,
+        data=data,
+        rollup=rollup,
+        recent=recent,
+        resampler=resampler,
+        month_revisions=month_revisions,
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        offset=source.offset + len(raw),
+        signature=(source.signature + raw)[-SOURCE_SIGNATURE_SIZE:],
+    )
+
+
+def is_csv_source_current(
+    source: CsvSource, stat: os.stat_result, parse_tail: bool
+) -> bool:
+    if (stat.st_size, stat.st_mtime_ns) != (source.size, source.mtime_ns):
+        return False
+    # an unchanged file is read again once its unterminated last line is settled
+    return source.offset >= stat.st_size or not parse_tail
+
+
+def is_csv_source_rewritten(
+    data_path: Path, source: CsvSource, stat: os.stat_result
+) -> bool:
+    if (stat.st_size, stat.st_mtime_ns) == (source.size, source.mtime_ns):
+        return False
+    if stat.st_size < source.offset:
+        return True
+    if stat.st_size <= source.size:
+        # same or smaller size but a newer mtime means the content was replaced
+        return True
+    with open(data_path, "rb") as f:
+        header = f.readline()
+        f.seek(source.offset - len(source.signature))
+        signature = f.read(len(source.signature))
+    return header != source.header or signature != source.signature
+
+
 class DataHandler:
-    def __init__(self, data_path: Path, price_per_kwh: float = 0.0) -> None:
+    def __init__(
+        self,
+        data_path: Path,
+        price_per_kwh: float = 0.0,
+        gap_policy: GapPolicy = DEFAULT_GAP_POLICY,
+        cache: Optional[SharedCache] = None,
+        max_cached_months: int = DEFAULT_MAX_CACHED_MONTHS,
+        snapshot: Optional[SnapshotStore] = None,
+    ) -> None:
         self.data_path = data_path
         self.price_per_kwh = price_per_kwh
+        self.gap_policy = gap_policy
+        self.cache = cache
+        self.max_cached_months = max_cached_months
+        self.snapshot = snapshot
 
         self.data: Optional[pd.DataFrame] = None
+        self.data_version = 0
         self.year: Optional[int] = None
         self.month: Optional[int] = None
         self.month_data: Optional[pd.DataFrame] = None
@@ -56,62 +321,269 @@ class DataHandler:
         self.month_series_minutely: Optional[TimeSeries] = None
         self.month_data_daily: Optional[pd.DataFrame] = None
         self.month_series_daily: Optional[TimeSeries] = None
+        self.month_rollup: Optional[RollupIndex] = None
+        self.date_range: Optional[Tuple[datetime.datetime, datetime.datetime]] = None
+        self.range_rollup: Optional[RollupIndex] = None
+        self.recent_readings: Optional[RecentReadings] = None
+        self._source: Optional[CsvSource] = None
+        self._month_bundles: OrderedDict[
+            Tuple[int, int], Tuple[Hashable, Optional[MonthBundle]]
+        ] = OrderedDict()
+
+    @property
+    def month_key(self) -> Optional[Hashable]:
+        if self.year is None or self.month is None:
+            return None
+        return self._get_month_key(self.year, self.month)
 
     @property
     def last_data_datetime(self) -> Optional[datetime.datetime]:
-        if self.data is None:
+        if self.recent_readings is None:
             return None
-        return self.data["Datetime"].dt.to_pydatetime().max()
+        return self.recent_readings.last_datetime
 
+    @instrumented("data.load_data")
     def load_data(self) -> None:
-        self._read_csv()
+        stat = os.stat(self.data_path)
+        parse_tail = is_csv_tail_settled(self.data_path, stat)
+        if self._source is not None and is_csv_source_current(
+            self._source, stat, parse_tail
+        ):
+            return
+        key = (
+            "csv",
+            str(self.data_path.resolve()),
+            stat.st_size,
+            stat.st_mtime_ns,
+            parse_tail,
+        )
+        self._source = self._cached(key, lambda: self._read_source(stat, parse_tail))
+        self.recent_readings = self._source.recent
+        if self._source.data is not self.data:
+            self.data = self._source.data
+            self.data_version += 1
+
+    def get_data_range(self) -> Optional[Tuple[datetime.datetime, datetime.datetime]]:
+        if self._source is None or len(self._source.rollup.hourly) <= 0:
+            return None
+        index = self._source.rollup.hourly.index
+        return (
+            index[0].to_pydatetime(),
+            (index[-1] + pd.Timedelta(hours=1)).to_pydatetime(),
+        )
+
+    def iter_range_data(
+        self, start: datetime.datetime, end: datetime.datetime
+    ) -> Iterator[pd.DataFrame]:
+        # one month is read at a time, so the memory does not grow with the range
+        for year, month in get_months_in_range(start, end):
+            month_data = self._read_month_data(year, month)
+            if month_data is None:
+                continue
+            in_range = (month_data["Datetime"] >= start) & (
+                month_data["Datetime"] < end
+            )
+            if in_range.any():
+                yield month_data.loc[in_range]
+
+    def get_range_rollup(
+        self, start: datetime.datetime, end: datetime.datetime
+    ) -> Optional[RollupIndex]:
+        fingerprints = tuple(
+            self._get_month_fingerprint(year, month)
+            for year, month in get_months_in_range(start, end)
+        )
+        key = ("range", str(self.data_path.resolve()), fingerprints, start, end)
+        return self._cached(key, lambda: self._build_range_rollup(start, end))
+
+    @instrumented("data.build_range")
+    def _build_range_rollup(
+        self, start: datetime.datetime, end: datetime.datetime
+    ) -> Optional[RollupIndex]:
+        # every month is reduced to its hourly rollup before the next one is read
+        rollups = [build_rollup(d) for d in self.iter_range_data(start, end)]
+        if len(rollups) <= 0:
+            return None
+        return concat_rollups(rollups)
+
+    def set_date_range(self, start: datetime.datetime, end: datetime.datetime) -> None:
+        self.date_range = (start, end)
+        self.range_rollup = self.get_range_rollup(start, end)
+
+    def clear_date_range(self) -> None:
+        self.date_range = None
+        self.range_rollup = None
 
     def set_price_per_kwh(self, price: float) -> None:
         self.price_per_kwh = price
 
     def get_years_and_months(self) -> Dict[str, List[str]]:
-        out = {}
-        if self.data is None:
+        out: Dict[str, List[str]] = {}
+        if self._source is None:
             return out
-        for year, data_year in self.data.groupby(self.data["Datetime"].dt.year):
-            month_list = list(data_year["Datetime"].dt.month.unique())
-            out[str(year)] = [calendar.month_name[m] for m in month_list]
+        for year, month in self._source.rollup.get_year_months():
+            out.setdefault(str(year), []).append(calendar.month_name[month])
         return out
 
+    @instrumented("data.set_year_and_month")
     def set_year_and_month(self, year: str, month: str) -> None:
-        if self.data is None:
+        year_num = int(year)
+        month_num = list(calendar.month_name).index(month)
+        bundle = self._get_month_bundle(year_num, month_num)
+        if bundle is None:
             return
-        self.year = int(year)
-        self.month = list(calendar.month_name).index(month)
-        year_filter = self.data["Datetime"].dt.year == self.year
-        month_filter = self.data["Datetime"].dt.month == self.month
-        self.month_data = self.data.loc[
-            year_filter & month_filter, ["Datetime", "Power (W)", "Device ID"]
-        ].copy()
-        self._set_month_minutely_data()
-        self._set_month_daily_data()
-
-    def _read_csv(self) -> None:
-        data = pd.read_csv(self.data_path)
-        data["Power (W)"] = data["Voltage (V)"] * data["Ampere (A)"]
-        data["Datetime"] = pd.to_datetime(data["Timestamp"], format="%Y-%m-%d %H:%M:%S")
-        data.insert(
-            loc=1,
-            column="Minute of day",
-            value=data["Datetime"].apply(lambda x: x.minute + (x.hour * 60)),
+        self.year = year_num
+        self.month = month_num
+        self.month_data = bundle.month_data
+        self.month_data_minutely = bundle.data_minutely
+        self.month_series_minutely = bundle.series_minutely
+        self.month_data_daily = bundle.data_daily
+        self.month_series_daily = bundle.series_daily
+        self.month_rollup = bundle.rollup
+
+    def get_month_series(self, year: int, month: int) -> Optional[TimeSeries]:
+        bundle = self._get_month_bundle(year, month)
+        return None if bundle is None else bundle.series_minutely
+
+    def _get_month_bundle(self, year: int, month: int) -> Optional[MonthBundle]:
+        fingerprint = self._get_month_fingerprint(year, month)
+        cached = self._month_bundles.get((year, month))
+        if cached is not None and cached[0] == fingerprint:
+            self._month_bundles.move_to_end((year, month))
+            return cached[1]
+        bundle = self._cached(
+            self._get_month_key(year, month, fingerprint),
+            lambda: self._load_month_bundle(year, month, fingerprint),
         )
-        self.data = data
+        self._month_bundles[(year, month)] = (fingerprint, bundle)
+        self._month_bundles.move_to_end((year, month))
+        while len(self._month_bundles) > self.max_cached_months:
+            self._month_bundles.popitem(last=False)
+        return bundle
 
-    def _set_month_minutely_data(self) -> None:
-        if self.month_data is None:
-            return
-        data_min_df, data_min_series = extract_minutely_data(self.month_data)
-        self.month_data_minutely = data_min_df
-        self.month_series_minutely = data_min_series
+    def _get_month_key(
+        self, year: int, month: int, fingerprint: Optional[Hashable] = None
+    ) -> Hashable:
+        if fingerprint is None:
+            fingerprint = self._get_month_fingerprint(year, month)
+        return (
+            "month",
+            str(self.data_path.resolve()),
+            fingerprint,
+            self.gap_policy,
+            year,
+            month,
+        )
 
-    def _set_month_daily_data(self) -> None:
-        if self.month_data is None:
-            return
-        data_daily_df, data_daily_series = extract_daily_data(self.month_data)
-        self.month_data_daily = data_daily_df
-        self.month_series_daily = data_daily_series
+    def _cached(self, key: Hashable, factory: Callable[[], T]) -> T:
+        if self.cache is None:
+            return factory()
+        return self.cache.get_or_create(key, factory)
+
+    def _read_source(self, stat: os.stat_result, parse_tail: bool) -> CsvSource:
+        source = self._source
+        if source is None and self.snapshot is not None:
+            # an appended file is read from the end of the snapshot, the same way as
+            # a running server reads the appended rows
+            source = self.snapshot.load(self._get_source_key(), self._get_inode(stat))
+            if source is not None and is_csv_source_current(source, stat, parse_tail):
+                return source
+        if source is None or is_csv_source_rewritten(self.data_path, source, stat):
+            source = read_csv_source(self.data_path, stat, parse_tail=parse_tail)
+            return self._save_source(source, stat)
+        source = read_appended_csv_source(self.data_path, source, stat, parse_tail)
+        growth = source.offset - source.snapshot_offset
+        if growth >= source.snapshot_offset * SNAPSHOT_REWRITE_GROWTH:
+            source = self._save_source(source, stat)
+        return source
+
+    def _save_source(self, source: CsvSource, stat: os.stat_result) -> CsvSource:
+        if self.snapshot is None:
+            return source
+        source = replace(source, snapshot_offset=source.offset)
+        self.snapshot.save(self._get_source_key(), self._get_inode(stat), source)
+        return source
+
+    def _get_source_key(self) -> Hashable:
+        return ("csv", str(self.data_path.resolve()))
+
+    @staticmethod
+    def _get_inode(stat: os.stat_result) -> Hashable:
+        # a replaced file has another inode, an appended one keeps it
+        return (stat.st_dev, stat.st_ino)
+
+    def _get_month_fingerprint(self, year: int, month: int) -> Hashable:
+        if self._source is None:
+            return None
+        revision = self._source.month_revisions.get((year, month), 0)
+        return (self._source.generation, revision)
+
+    def _load_month_bundle(
+        self, year: int, month: int, fingerprint: Hashable
+    ) -> Optional[MonthBundle]:
+        if self.snapshot is None:
+            return self._build_month_bundle(year, month)
+        key = ("month", str(self.data_path.resolve()), self.gap_policy, year, month)
+        bundle = self.snapshot.load(key, fingerprint)
+        if bundle is None:
+            bundle = self._build_month_bundle(year, month)
+            if bundle is not None:
+                self.snapshot.save(key, fingerprint, bundle)
+        return bundle
+
+    @instrumented("data.build_month")
+    def _build_month_bundle(self, year: int, month: int) -> Optional[MonthBundle]:
+        month_data = self._read_month_data(year, month)
+        if month_data is None:
+            return None
+        data_min_df, data_min_series = extract_minutely_data(
+            month_data, self.gap_policy
+        )
+        rollup = self._get_month_rollup(year, month, month_data)
+        if rollup is None:
+            return None
+        data_daily_df, data_daily_series = extract_daily_data_from_rollup(rollup)
+        return MonthBundle(
+            month_data=month_data,
+            data_minutely=data_min_df,
+            series_minutely=data_min_series,
+            data_daily=data_daily_df,
+            series_daily=data_daily_series,
+            rollup=rollup,
+        )
+
+    def _get_month_rollup(
+        self, year: int, month: int, month_data: Optional[pd.DataFrame] = None
+    ) -> Optional[RollupIndex]:
+        if self._source is not None:
+            return self._source.rollup.get_month(year, month)
+        if month_data is None:
+            return None
+        return build_rollup(month_data)
+
+    def _read_month_data(self, year: int, month: int) -> Optional[pd.DataFrame]:
+        if self.data is None:
+            return None
+        year_filter = self.data["Datetime"].dt.year == year
+        month_filter = self.data["Datetime"].dt.month == month
+        return self.data.loc[
+            year_filter & month_filter,
+            ["Datetime", "Power (W)", "Device ID", "Energy (kWh)"],
+        ].copy()
+
+
+def create_data_handler(
+    data_path: Path,
+    price_per_kwh: float = 0.0,
+    gap_policy: GapPolicy = DEFAULT_GAP_POLICY,
+    cache: Optional[SharedCache] = None,
+    snapshot_dir: Optional[Path] = None,
+) -> DataHandler:
+    snapshot = None if snapshot_dir is None else SnapshotStore(snapshot_dir)
+    if data_path.is_dir():
+        from src.data.partitioned_store import PartitionedDataHandler
+
+        return PartitionedDataHandler(
+            data_path, price_per_kwh, gap_policy, cache, snapshot=snapshot
+        )
+    return DataHandler(data_path, price_per_kwh, gap_policy, cache, snapshot=snapshot)
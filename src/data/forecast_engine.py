@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import datetime
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Hashable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from src.constants import DEFAULT_FORECAST_MODE, DEFAULT_FORECAST_WORKERS, ForecastMode
+from src.data.cache import SharedCache
+from src.data.forecaster import (
+    Forecaster,
+    LGBMForecaster,
+    NativeLGBMForecaster,
+    ParallelLGBMForecaster,
+    get_month_end_date,
+)
+
+if TYPE_CHECKING:
+    from darts import TimeSeries
+
+
+class ForecastEngine:
+    def __init__(
+        self,
+        forecaster: Forecaster,
+        model_key: Hashable,
+        cache: Optional[SharedCache] = None,
+    ) -> None:
+        self.forecaster = forecaster
+        self.model_key = model_key
+        self.cache = cache
+
+    def forecast_month_end(
+        self, items: Sequence[Tuple[Hashable, TimeSeries]]
+    ) -> List[Optional[TimeSeries]]:
+        out: List[Optional[TimeSeries]] = [
+            None if self.cache is None else self.cache.get(self._get_key(k))
+            for k, _ in items
+        ]
+        missing = [i for i, o in enumerate(out) if o is None]
+        predicted = self._predict_month_end([items[i][1] for i in missing])
+        for i, forecast in zip(missing, predicted):
+            out[i] = forecast
+            if self.cache is not None and forecast is not None:
+                self.cache.put(self._get_key(items[i][0]), forecast)
+        return out
+
+    def _predict_month_end(
+        self, series: Sequence[TimeSeries]
+    ) -> List[Optional[TimeSeries]]:
+        if len(series) <= 0:
+            return []
+        target_dates = [
+            get_month_end_date(s.end_time().date())  # type: ignore
+            for s in series
+        ]
+        return self.forecaster.predict_batch(series, target_dates)
+
+    def _get_key(self, series_key: Hashable) -> Hashable:
+        return ("forecast", self.model_key, series_key)
+
+
+def load_forecaster(
+    model_path: Path,
+    mode: ForecastMode = DEFAULT_FORECAST_MODE,
+    workers: int = DEFAULT_FORECAST_WORKERS,
+) -> Forecaster:
+    if mode == "parallel":
+        return ParallelLGBMForecaster(model_path, workers)
+    if mode == "native":
+        return NativeLGBMForecaster(model_path)
+    return LGBMForecaster(model_path)
+
+
+def get_model_files(model_path: Path) -> List[Path]:
+    if model_path.is_dir():
+        return sorted(model_path.glob("*.pkl"))
+    return [model_path]
+
+
+def create_forecast_engine(
+    model_path: Path,
+    cache: SharedCache,
+    mode: ForecastMode = DEFAULT_FORECAST_MODE,
+    workers: int = DEFAULT_FORECAST_WORKERS,
+) -> ForecastEngine:
+    stats = [(f, os.stat(f)) for f in get_model_files(model_path)]
+    model_key = (
+        str(model_path.resolve()),
+        tuple((f.name, s.st_mtime_ns) for f, s in stats),
+    )
+    forecaster = cache.get_or_create(
+        ("model", *model_key, mode, workers),
+        lambda: load_forecaster(model_path, mode, workers),
+        size=sum(s.st_size for _, s in stats),
+    )
+    return ForecastEngine(forecaster, model_key, cache)
+
+
+def slice_forecast(
+    forecast: TimeSeries, after: pd.Timestamp, target_date: datetime.date
+) -> Optional[TimeSeries]:
+    # the month-end rollout is cut instead of predicting the shorter horizon, the
+    # last chunk of a rollout is shifted back to end at its horizon, so the cut
+    # steps can differ slightly from a rollout that ends at the target date
+    target_datetime = pd.Timestamp(target_date) + pd.Timedelta(hours=23, minutes=59)
+    time_index = forecast.time_index
+    selected = (time_index > after) & (time_index <= target_datetime)
+    if not selected.any():
+        return None
+    return forecast[selected.argmax() : selected.argmax() + selected.sum()]
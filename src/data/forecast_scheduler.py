@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import calendar
+import datetime
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Hashable, List, Optional, Tuple
+
+import pandas as pd
+
+from src.constants import (
+    DEFAULT_FORECAST_MODE,
+    DEFAULT_FORECAST_REFRESH_SECONDS,
+    DEFAULT_FORECAST_WORKERS,
+    DEFAULT_MAX_FORECAST_TARGETS,
+    ForecastMode,
+    GapPolicy,
+)
+from src.data.cache import SharedCache
+from src.data.data_handler import DataHandler, create_data_handler
+from src.data.forecast_engine import create_forecast_engine
+from src.data.forecaster import AverageForecaster
+
+if TYPE_CHECKING:
+    from darts import TimeSeries
+
+
+@dataclass(frozen=True)
+class WatchTarget:
+    data_path: Path
+    gap_policy: GapPolicy
+    year: int
+    month: int
+
+
+@dataclass(frozen=True)
+class CompletedForecast:
+    model_key: Hashable
+    month_key: Hashable
+    series_end: pd.Timestamp
+    minutely: Optional[TimeSeries]
+    average: AverageForecaster
+    completed_at: datetime.datetime
+
+    @property
+    def age(self) -> datetime.timedelta:
+        return datetime.datetime.now() - self.completed_at
+
+
+class ForecastScheduler:
+    def __init__(
+        self,
+        model_path: Path,
+        cache: SharedCache,
+        refresh_seconds: float = DEFAULT_FORECAST_REFRESH_SECONDS,
+        mode: ForecastMode = DEFAULT_FORECAST_MODE,
+        workers: int = DEFAULT_FORECAST_WORKERS,
+        max_targets: int = DEFAULT_MAX_FORECAST_TARGETS,
+    ) -> None:
+        self.model_path = model_path
+        self.cache = cache
+        self.mode = mode
+        self.workers = workers
+        self.refresh_seconds = refresh_seconds
+        self.max_targets = max_targets
+        self.last_error: Optional[str] = None
+        self._handlers: OrderedDict[WatchTarget, DataHandler] = OrderedDict()
+        self._completed: Dict[WatchTarget, CompletedForecast] = {}
+        self._errors: Dict[WatchTarget, str] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def watch(self, target: WatchTarget) -> Optional[CompletedForecast]:
+        with self._lock:
+            if target not in self._handlers:
+                self._handlers[target] = create_data_handler(
+                    target.data_path, gap_policy=target.gap_policy, cache=self.cache
+                )
+                self._wake.set()
+            self._handlers.move_to_end(target)
+            # the least recently watched months are dropped together with their data
+            while len(self._handlers) > self.max_targets:
+                dropped, _ = self._handlers.popitem(last=False)
+                self._completed.pop(dropped, None)
+                self._errors.pop(dropped, None)
+            return self._completed.get(target)
+
+    def get_error(self, target: WatchTarget) -> Optional[str]:
+        with self._lock:
+            return self._errors.get(target, self.last_error)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+            self._wake.wait(self.refresh_seconds)
+            self._wake.clear()
+
+    def refresh(self) -> None:
+        engine = create_forecast_engine(
+            self.model_path, self.cache, self.mode, self.workers
+        )
+        with self._lock:
+            targets = list(self._handlers.items())
+        stale: List[Tuple[WatchTarget, DataHandler]] = []
+        for target, handler in targets:
+            handler.load_data()
+            handler.set_year_and_month(
+                str(target.year), calendar.month_name[target.month]
+            )
+            completed = self._completed.get(target)
+            if (
+                handler.month_key is None
+                or handler.month_series_minutely is None
+                or handler.month_data_daily is None
+            ):
+                continue
+            if (
+                completed is not None
+                and completed.month_key == handler.month_key
+                and completed.model_key == engine.model_key
+            ):
+                continue
+            stale.append((target, handler))
+        if len(stale) <= 0:
+            return
+
+        # the stale months of the same devices are rolled out in one batched model
+        # call, so a site that the model cannot forecast does not fail the others
+        batches: Dict[Tuple[str, ...], List[Tuple[WatchTarget, DataHandler]]] = {}
+        for target, handler in stale:
+            devices = tuple(handler.month_series_minutely.components)  # type: ignore
+            batches.setdefault(devices, []).append((target, handler))
+        for batch in batches.values():
+            items = [(h.month_key, h.month_series_minutely) for _, h in batch]
+            try:
+                forecasts = engine.forecast_month_end(items)  # type: ignore
+            except Exception as e:
+                with self._lock:
+                    for target, _ in batch:
+                        self._errors[target] = str(e)
+                continue
+            for (target, handler), forecast in zip(batch, forecasts):
+                daily = handler.month_data_daily
+                completed = CompletedForecast(
+                    model_key=engine.model_key,
+                    month_key=handler.month_key,
+                    series_end=handler.month_series_minutely.end_time(),  # type: ignore
+                    minutely=forecast,
+                    average=AverageForecaster().fit(daily),  # type: ignore
+                    completed_at=datetime.datetime.now(),
+                )
+                with self._lock:
+                    if target in self._handlers:
+                        self._completed[target] = completed
+                        self._errors.pop(target, None)
@@ -1,82 +1,382 @@
+from __future__ import annotations
+
+import calendar
 import datetime
+import multiprocessing
+import weakref
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Protocol, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
-from darts import TimeSeries
-from darts.models import LightGBMModel
 
-from src.constants import DEFAULT_DATA_SAMPLING_MINUTE
+from src.constants import DEFAULT_DATA_SAMPLING_MINUTE, DEFAULT_FORECAST_WORKERS
+from src.data.time_utils import get_minute_of_day
+from src.instrumentation import instrumented
+
+# darts and lightgbm take seconds to import, so they are only imported once a model
+# is loaded or a forecast series is built
+if TYPE_CHECKING:
+    from darts import TimeSeries
+    from darts.models import LightGBMModel
 
 
 class AverageForecaster:
     def __init__(self):
-        self.means: Optional[Dict[str, float]] = None
+        self.means: Optional[pd.Series] = None
 
     @property
     def total_daily_average(self) -> float:
         if self.means is None:
             return 0
-        return sum(self.means.values())
+        return float(self.means.sum())
 
     def fit(self, daily_df: pd.DataFrame) -> "AverageForecaster":
-        out = {}
-        mean_data = daily_df.mean()
-        for name in daily_df.mean().index:
-            if name == "Date":
-                continue
-            out[name] = mean_data[name]
-        self.means = out
+        self.means = daily_df.drop(columns=["Date"], errors="ignore").mean()
         return self
 
-    def predict(self, days: float) -> Optional[Dict[str, float]]:
+    def predict(self, days: float) -> Optional[pd.Series]:
         if self.means is None:
             return None
-        out = {}
-        for n, v in self.means.items():
-            out[n] = v * days
-        out["All"] = sum(out.values())
+        out = self.means * days
+        out["All"] = out.sum()
         return out
 
 
+def get_minute_covariates(series: TimeSeries, horizon_samples: int) -> TimeSeries:
+    from darts import TimeSeries
+
+    time_index = series.time_index
+    if horizon_samples > 0:
+        time_index = time_index.append(
+            pd.date_range(
+                time_index[-1] + series.freq,
+                periods=horizon_samples,
+                freq=series.freq,
+            )
+        )
+    minute_df = pd.DataFrame({"Datetime": time_index})
+    minute_df["Minute"] = get_minute_of_day(minute_df["Datetime"])
+    return TimeSeries.from_dataframe(minute_df, time_col="Datetime", value_cols="Minute")
+
+
+def get_month_end_date(date: datetime.date) -> datetime.date:
+    return date.replace(day=calendar.monthrange(date.year, date.month)[1])
+
+
+def get_horizon_samples(
+    series: TimeSeries, target_date: datetime.date
+) -> Optional[int]:
+    target_datetime = datetime.datetime(
+        year=target_date.year,
+        month=target_date.month,
+        day=target_date.day,
+        hour=23,
+        minute=59,
+    )
+    if not isinstance(end_time := series.end_time(), pd.Timestamp):
+        return None
+    # in steps of the grid that the readings of the series were resampled to
+    return int((target_datetime - end_time) / pd.Timedelta(series.freq))
+
+
+class Forecaster(Protocol):
+    def predict(
+        self, series: TimeSeries, target_date: datetime.date
+    ) -> Optional[TimeSeries]: ...
+
+    def predict_batch(
+        self, series: Sequence[TimeSeries], target_dates: Sequence[datetime.date]
+    ) -> List[Optional[TimeSeries]]: ...
+
+
 class LGBMForecaster:
     def __init__(
         self, model_path: Path, sampling_minute: int = DEFAULT_DATA_SAMPLING_MINUTE
     ) -> None:
+        from darts.models import LightGBMModel
+
         self.model: LightGBMModel = LightGBMModel.load(model_path)  # type: ignore
         self.sampling_minute = sampling_minute
 
-    def predict(self, series: TimeSeries, target_date: datetime.date):
-        target_datetime = datetime.datetime(
-            year=target_date.year,
-            month=target_date.month,
-            day=target_date.day,
-            hour=23,
-            minute=59,
-        )
-        if not isinstance(end_time := series.end_time(), pd.Timestamp):
-            return None
-        forecast_delta = target_datetime - end_time.to_pydatetime()
-        forecast_minutes = (forecast_delta.days * 24 * 60) + (
-            forecast_delta.seconds / 60
-        )
-        horizon_samples = int(forecast_minutes / self.sampling_minute)
-        minute_df = (
-            series.univariate_component(0)
-            .append_values(np.array([0] * horizon_samples))
-            .pd_dataframe()
-            .reset_index()
-            .loc[:, ["Datetime"]]
-        )
-        minute_df["Minute"] = minute_df["Datetime"].apply(
-            lambda x: x.minute + (x.hour * 60)
+    def predict(
+        self, series: TimeSeries, target_date: datetime.date
+    ) -> Optional[TimeSeries]:
+        return self.predict_batch([series], [target_date])[0]
+
+    @instrumented("forecast.lgbm_predict")
+    def predict_batch(
+        self, series: Sequence[TimeSeries], target_dates: Sequence[datetime.date]
+    ) -> List[Optional[TimeSeries]]:
+        horizons = [get_horizon_samples(s, d) for s, d in zip(series, target_dates)]
+        valid = [i for i, h in enumerate(horizons) if h is not None and h > 0]
+        out: List[Optional[TimeSeries]] = [None] * len(series)
+        if len(valid) <= 0:
+            return out
+        horizon_samples = max(horizons[i] for i in valid)  # type: ignore
+        forecasts = self.predict_samples([series[i] for i in valid], horizon_samples)
+        for i, forecast in zip(valid, forecasts):
+            out[i] = forecast[: horizons[i]]
+        return out
+
+    def predict_samples(
+        self, series: Sequence[TimeSeries], horizon_samples: int
+    ) -> List[TimeSeries]:
+        # the covariates must cover the last output chunk even if it is cut short
+        chunk_length = self.model.output_chunk_length
+        covariate_samples = -(-horizon_samples // chunk_length) * chunk_length
+        # darts builds the lag tables of all series in a single model call
+        forecasts = self.model.predict(
+            horizon_samples,
+            series=list(series),
+            future_covariates=[
+                get_minute_covariates(s, covariate_samples) for s in series
+            ],
         )
-        minute_series = TimeSeries.from_dataframe(
-            minute_df, time_col="Datetime", value_cols="Minute"
+        return list(forecasts)  # type: ignore
+
+
+# Recursive rollout of the boosters of the saved darts model without darts. Only the
+# target lags of every series are kept in a preallocated buffer and the minute of day
+# covariate is computed from the timestamps, so every output chunk costs one feature
+# matrix for the whole batch and one predict call per booster.
+class NativeLGBMForecaster(LGBMForecaster):
+    def __init__(
+        self, model_path: Path, sampling_minute: int = DEFAULT_DATA_SAMPLING_MINUTE
+    ) -> None:
+        super().__init__(model_path, sampling_minute)
+        lags = self.model.lags
+        if (
+            set(lags.keys()) != {"target", "future"}
+            or not self.model.multi_models
+            or getattr(self.model, "output_chunk_shift", 0) != 0
+            or self.model.uses_static_covariates
+        ):
+            raise ValueError(
+                "Only models with target lags, the minute of day future covariate "
+                "and one model per output step are supported"
+            )
+        self.target_lags = np.array(lags["target"])
+        self.future_lags = np.array(lags["future"])
+        self.output_chunk_length: int = self.model.output_chunk_length
+        self.history_length = int(-self.target_lags.min())
+        self.components = get_model_components(self.model)
+        self.boosters = [e.booster_ for e in self.model.model.estimators_]
+
+    def predict_samples(
+        self, series: Sequence[TimeSeries], horizon_samples: int
+    ) -> List[TimeSeries]:
+        from darts import TimeSeries
+
+        num_series = len(series)
+        num_components = len(self.components)
+        step = self.output_chunk_length
+        history = self.history_length
+        for s in series:
+            if list(s.components) != self.components or len(s) < history:
+                raise ValueError(
+                    f"The series must have the devices {self.components} and at "
+                    f"least {history} samples"
+                )
+
+        # like darts, a last chunk that would pass the horizon is moved back to end
+        # at it and only its steps after the previous chunk are kept
+        starts = np.arange(0, horizon_samples, step)
+        if len(starts) > 1 and horizon_samples % step != 0:
+            starts[-1] = horizon_samples - step
+        length = int(starts[-1]) + step
+
+        # the history and the forecast of every series, the forecast chunks are
+        # written in place and read back as the lags of the next chunk
+        values = np.empty((num_series, history + length, num_components))
+        for i, s in enumerate(series):
+            values[i, :history] = s.values(copy=False)[-history:]
+
+        # minute of day from the first covariate lag of the first chunk until the
+        # last covariate lag of the last chunk, one sliding window per chunk
+        freq = pd.Timedelta(series[0].freq)
+        first_lag = int(self.future_lags.min())
+        window = int(self.future_lags.max()) - first_lag + 1
+        offsets = (
+            np.arange(length - step + window) * freq.to_timedelta64() + first_lag * freq
         )
-        return self.model.predict(
-            horizon_samples,
-            series=series,
-            future_covariates=minute_series,
+        minutes = np.stack(
+            [
+                get_minute_of_day(pd.Series(s.end_time() + freq + offsets))
+                for s in series
+            ]
+        ).astype(np.float64)
+        windows = np.lib.stride_tricks.sliding_window_view(minutes, window, axis=1)
+        windows = windows[:, starts][:, :, self.future_lags - first_lag]
+
+        num_target_features = len(self.target_lags) * num_components
+        features = np.empty((num_series, num_target_features + len(self.future_lags)))
+        outputs = np.empty((num_series, len(self.boosters)))
+        end = 0
+        for chunk, chunk_start in enumerate(starts):
+            start = history + chunk_start
+            features[:, :num_target_features] = values[
+                :, start + self.target_lags
+            ].reshape(num_series, -1)
+            features[:, num_target_features:] = windows[:, chunk]
+            for i, booster in enumerate(self.boosters):
+                outputs[:, i] = booster.predict(features)
+            skip = end - chunk_start
+            values[:, start + skip : start + step] = outputs.reshape(
+                num_series, step, num_components
+            )[:, skip:]
+            end = chunk_start + step
+
+        out = []
+        for i, s in enumerate(series):
+            time_index = pd.date_range(
+                s.end_time() + freq,
+                periods=horizon_samples,
+                freq=freq,
+                name=s.time_index.name,
+            )
+            out.append(
+                TimeSeries.from_times_and_values(
+                    time_index,
+                    values[i, history : history + horizon_samples],
+                    columns=self.components,
+                )
+            )
+        return out
+
+
+# models loaded by the current worker process, kept across the tasks of the worker
+_WORKER_FORECASTERS: Dict[Path, LGBMForecaster] = {}
+
+
+def get_worker_forecaster(
+    model_path: Path, sampling_minute: int = DEFAULT_DATA_SAMPLING_MINUTE
+) -> LGBMForecaster:
+    if model_path not in _WORKER_FORECASTERS:
+        _WORKER_FORECASTERS[model_path] = LGBMForecaster(model_path, sampling_minute)
+    return _WORKER_FORECASTERS[model_path]
+
+
+def _predict_in_worker(
+    model_path: Path,
+    sampling_minute: int,
+    series: TimeSeries,
+    target_date: datetime.date,
+) -> Optional[TimeSeries]:
+    return get_worker_forecaster(model_path, sampling_minute).predict(
+        series, target_date
+    )
+
+
+def get_model_components(model: LightGBMModel) -> List[str]:
+    if model.training_series is None:
+        raise ValueError("The model does not keep its training series components")
+    return list(model.training_series.components)
+
+
+# Rolls out independent models in a process pool. The model path is either a single
+# global model, then the series of a batch are forecast in parallel, or a directory
+# with one model per device group, then the groups of every series are forecast in
+# parallel and stacked back into one multivariate series. The models are only loaded
+# by the workers, so this forecaster has no model of its own.
+class ParallelLGBMForecaster:
+    def __init__(
+        self,
+        model_path: Path,
+        workers: int = DEFAULT_FORECAST_WORKERS,
+        sampling_minute: int = DEFAULT_DATA_SAMPLING_MINUTE,
+    ) -> None:
+        self.sampling_minute = sampling_minute
+        self.workers = workers
+        self.groups: List[Tuple[Path, Optional[List[str]]]] = []
+        if model_path.is_dir():
+            from darts.models import LightGBMModel
+
+            owners: Dict[str, Path] = {}
+            for group_path in sorted(model_path.glob("*.pkl")):
+                model: LightGBMModel = LightGBMModel.load(group_path)  # type: ignore
+                components = get_model_components(model)
+                # the forecasts of the groups are stacked, so a device has one model
+                for c in components:
+                    if c in owners:
+                        raise ValueError(
+                            f"The device {c} is in both {owners[c].name} and "
+                            f"{group_path.name}"
+                        )
+                    owners[c] = group_path
+                self.groups.append((group_path, components))
+        else:
+            self.groups.append((model_path, None))
+        if len(self.groups) <= 0:
+            raise ValueError(f"No model found in {model_path}")
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def predict(
+        self, series: TimeSeries, target_date: datetime.date
+    ) -> Optional[TimeSeries]:
+        return self.predict_batch([series], [target_date])[0]
+
+    @instrumented("forecast.lgbm_predict")
+    def predict_batch(
+        self, series: Sequence[TimeSeries], target_dates: Sequence[datetime.date]
+    ) -> List[Optional[TimeSeries]]:
+        from darts import concatenate
+
+        horizons = [get_horizon_samples(s, d) for s, d in zip(series, target_dates)]
+        out: List[Optional[TimeSeries]] = [None] * len(series)
+        tasks: Dict[int, List[Future]] = {}
+        for i, (s, d) in enumerate(zip(series, target_dates)):
+            if horizons[i] is None or horizons[i] <= 0:  # type: ignore
+                continue
+            tasks[i] = [
+                self._submit(path, s if group is None else s[group], d)
+                for path, group in self._get_groups(s)
+            ]
+        for i, futures in tasks.items():
+            forecasts = [f.result() for f in futures]
+            if any(f is None for f in forecasts):
+                continue
+            # keep the component order of the input series
+            out[i] = concatenate(forecasts, axis=1)[list(series[i].components)]
+        return out
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _get_groups(
+        self, series: TimeSeries
+    ) -> List[Tuple[Path, Optional[List[str]]]]:
+        if self.groups[0][1] is None:
+            return self.groups
+        components = set(series.components)
+        groups = [(p, g) for p, g in self.groups if set(g or []) <= components]
+        covered = {c for _, g in groups for c in g or []}
+        if covered != components:
+            missing = ", ".join(sorted(components - covered))
+            raise ValueError(f"No device group model covers {missing}")
+        return groups
+
+    def _submit(
+        self, model_path: Path, series: TimeSeries, target_date: datetime.date
+    ) -> Future:
+        if self.workers <= 1:
+            future: Future = Future()
+            future.set_result(
+                _predict_in_worker(
+                    model_path, self.sampling_minute, series, target_date
+                )
+            )
+            return future
+        if self._executor is None:
+            # LightGBM threads do not survive a fork, so the workers are spawned
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            weakref.finalize(self, self._executor.shutdown, wait=False)
+        return self._executor.submit(
+            _predict_in_worker, model_path, self.sampling_minute, series, target_date
         )
@@ -0,0 +1,148 @@
+import csv
+import datetime
+import io
+import math
+import os
+from pathlib import Path
+from typing import Any, List, Protocol, Tuple
+
+import pandas as pd
+
+CSV_COLUMNS = ["Voltage (V)", "Ampere (A)", "Timestamp", "Device ID"]
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+Reading = Tuple[float, float, str, str]
+
+
+class InvalidReadingError(ValueError):
+    pass
+
+
+def parse_timestamp(value: Any) -> str:
+    if isinstance(value, bool):
+        raise InvalidReadingError("Timestamp must be a string or a number")
+    if isinstance(value, str) and not value.strip().isdigit():
+        try:
+            return datetime.datetime.strptime(value, TIMESTAMP_FORMAT).strftime(
+                TIMESTAMP_FORMAT
+            )
+        except ValueError:
+            raise InvalidReadingError(
+                f"Timestamp must follow {TIMESTAMP_FORMAT} or be a unix epoch"
+            )
+    try:
+        epoch = float(value)
+    except (TypeError, ValueError):
+        raise InvalidReadingError("Timestamp must be a string or a number")
+    if not math.isfinite(epoch) or epoch < 0:
+        raise InvalidReadingError("Timestamp epoch must be a positive number")
+    # edge devices send unix epoch seconds, stored as naive UTC like the CSV data
+    return (
+        datetime.datetime.fromtimestamp(epoch, datetime.timezone.utc)
+        .replace(tzinfo=None)
+        .strftime(TIMESTAMP_FORMAT)
+    )
+
+
+def parse_measurement(reading: dict, name: str) -> float:
+    value = reading.get(name)
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise InvalidReadingError(f"{name} must be a number")
+    try:
+        number = float(value)
+    except ValueError:
+        raise InvalidReadingError(f"{name} must be a number")
+    if not math.isfinite(number) or number < 0:
+        raise InvalidReadingError(f"{name} must be a finite non-negative number")
+    return number
+
+
+def validate_reading(reading: Any) -> Reading:
+    if not isinstance(reading, dict):
+        raise InvalidReadingError("Reading must be a JSON object")
+    device_id = reading.get("Device ID")
+    if not isinstance(device_id, str) or len(device_id.strip()) <= 0:
+        raise InvalidReadingError("Device ID must be a non-empty string")
+    if "Timestamp" not in reading:
+        raise InvalidReadingError("Timestamp is required")
+    return (
+        parse_measurement(reading, "Voltage (V)"),
+        parse_measurement(reading, "Ampere (A)"),
+        parse_timestamp(reading["Timestamp"]),
+        device_id.strip(),
+    )
+
+
+def validate_readings(payload: Any) -> List[Reading]:
+    readings = payload if isinstance(payload, list) else [payload]
+    if len(readings) <= 0:
+        raise InvalidReadingError("No reading is given")
+    out = []
+    for i, reading in enumerate(readings):
+        try:
+            out.append(validate_reading(reading))
+        except InvalidReadingError as e:
+            if len(readings) == 1:
+                raise
+            raise InvalidReadingError(f"Reading {i}: {e}")
+    return out
+
+
+class ReadingBuffer:
+    def __init__(self) -> None:
+        self._readings: List[Reading] = []
+
+    def __len__(self) -> int:
+        return len(self._readings)
+
+    def extend(self, readings: List[Reading]) -> None:
+        self._readings.extend(readings)
+
+    def peek(self) -> pd.DataFrame:
+        return pd.DataFrame.from_records(self._readings, columns=CSV_COLUMNS)
+
+    def discard(self, count: int) -> None:
+        # readings added while the first ones were written are kept
+        del self._readings[:count]
+
+
+class ReadingWriter(Protocol):
+    def write(self, data: pd.DataFrame) -> None: ...
+
+
+class CsvReadingWriter:
+    def __init__(self, data_path: Path) -> None:
+        self.data_path = data_path
+
+    def write(self, data: pd.DataFrame) -> None:
+        columns = CSV_COLUMNS
+        is_new = not self.data_path.exists() or self.data_path.stat().st_size <= 0
+        out = io.StringIO()
+        if not is_new:
+            with open(self.data_path, "r", newline="") as f:
+                columns = next(csv.reader(f))
+            with open(self.data_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                # a last line without a line break would be glued to the first row
+                if f.read(1) not in (b"\n", b"\r"):
+                    out.write("\n")
+        data.loc[:, columns].to_csv(out, header=is_new, index=False)
+        # rows are formatted first and appended at once, readers skip partial lines
+        with open(self.data_path, "a", newline="") as f:
+            f.write(out.getvalue())
+
+
+class PartitionReadingWriter:
+    def __init__(self, data_path: Path) -> None:
+        self.data_path = data_path
+
+    def write(self, data: pd.DataFrame) -> None:
+        from src.data.partitioned_store import write_partitions
+
+        write_partitions(data, self.data_path)
+
+
+def create_reading_writer(data_path: Path) -> ReadingWriter:
+    if data_path.is_dir():
+        return PartitionReadingWriter(data_path)
+    return CsvReadingWriter(data_path)
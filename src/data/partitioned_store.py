@@ -0,0 +1,226 @@
+import calendar
+import datetime
+import os
+import re
+import time
+import uuid
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.constants import DEFAULT_GAP_POLICY, DEFAULT_MAX_CACHED_MONTHS, GapPolicy
+from src.data.cache import SharedCache
+from src.data.data_handler import DataHandler
+from src.data.recent_readings import RecentReadings
+from src.data.resampling import resample_readings
+from src.data.snapshot import SnapshotStore
+from src.instrumentation import instrumented
+
+PARTITION_PATTERN = re.compile(r"^year=(\d+)/month=(\d+)$")
+# a partition directory modified this recently is listed again even if its mtime is
+# unchanged, since a coarse mtime may not change for a second file
+PARTITION_DIR_SETTLE_NS = 2 * 10**9
+PARTITION_SCHEMA = pa.schema(
+    [
+        ("Datetime", pa.timestamp("ns")),
+        ("Device ID", pa.dictionary(pa.int32(), pa.string())),
+        ("Voltage (V)", pa.float32()),
+        ("Ampere (A)", pa.float32()),
+    ]
+)
+
+
+def get_partition_dir(root: Path, year: int, month: int) -> Path:
+    return root / f"year={year}" / f"month={month}"
+
+
+def to_partition_frame(data: pd.DataFrame) -> pd.DataFrame:
+    if "Datetime" in data.columns:
+        timestamps = pd.to_datetime(data["Datetime"])
+    else:
+        timestamps = pd.to_datetime(data["Timestamp"], format="%Y-%m-%d %H:%M:%S")
+    return pd.DataFrame(
+        {
+            "Datetime": timestamps.astype("datetime64[ns]"),
+            "Device ID": data["Device ID"].astype(str).astype("category"),
+            "Voltage (V)": data["Voltage (V)"].astype("float32"),
+            "Ampere (A)": data["Ampere (A)"].astype("float32"),
+        }
+    )
+
+
+def write_partitions(data: pd.DataFrame, root: Path) -> List[Path]:
+    partition_data = to_partition_frame(data)
+    written = []
+    datetimes = partition_data["Datetime"].dt
+    for (year, month), d in partition_data.groupby([datetimes.year, datetimes.month]):
+        partition_dir = get_partition_dir(root, int(year), int(month))
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        name = f"part-{uuid.uuid4().hex}.parquet"
+        file_path = partition_dir / name
+        tmp_path = partition_dir / f".{name}.tmp"
+        table = pa.Table.from_pandas(
+            d.reset_index(drop=True), schema=PARTITION_SCHEMA, preserve_index=False
+        )
+        # written next to the partition and renamed, so a file never changes once
+        # it is listed and a new file always changes the mtime of its directory
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, file_path)
+        written.append(file_path)
+    return written
+
+
+def convert_csv_to_partitions(
+    csv_path: Path, root: Path, chunksize: int = 1_000_000
+) -> None:
+    if root.exists() and any(root.iterdir()):
+        raise FileExistsError(f"Partition directory {root} is not empty")
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        write_partitions(chunk, root)
+
+
+def list_partition_files(partition_dir: Path) -> List[Tuple[Path, int, int]]:
+    out = []
+    for file_path in sorted(partition_dir.glob("*.parquet")):
+        stat = file_path.stat()
+        out.append((file_path, stat.st_size, stat.st_mtime_ns))
+    return out
+
+
+@instrumented("data.read_parquet")
+def read_partition_readings(files: List[Path]) -> pd.DataFrame:
+    table = pa.concat_tables(
+        [pq.read_table(f, memory_map=True) for f in files]
+    ).unify_dictionaries()
+    data = table.to_pandas()
+    data["Power (W)"] = data["Voltage (V)"] * data["Ampere (A)"]
+    data["Device ID"] = data["Device ID"].cat.remove_unused_categories()
+    return data.loc[:, ["Datetime", "Power (W)", "Device ID"]]
+
+
+def read_partition_files(files: List[Path]) -> pd.DataFrame:
+    return resample_readings(read_partition_readings(files))
+
+
+class PartitionedDataHandler(DataHandler):
+    def __init__(
+        self,
+        data_path: Path,
+        price_per_kwh: float = 0.0,
+        gap_policy: GapPolicy = DEFAULT_GAP_POLICY,
+        cache: Optional[SharedCache] = None,
+        max_cached_months: int = DEFAULT_MAX_CACHED_MONTHS,
+        snapshot: Optional[SnapshotStore] = None,
+    ) -> None:
+        super().__init__(
+            data_path, price_per_kwh, gap_policy, cache, max_cached_months, snapshot
+        )
+        self.partitions: Dict[Tuple[int, int], List[Path]] = {}
+        self._partition_files: FrozenSet[Tuple[Path, int, int]] = frozenset()
+        self._partition_dirs: Dict[Path, Tuple[int, List[Tuple[Path, int, int]]]] = {}
+
+    @instrumented("data.load_data")
+    def load_data(self) -> None:
+        partitions: Dict[Tuple[int, int], List[Path]] = {}
+        files = set()
+        partition_dirs = {}
+        now = time.time_ns()
+        # files are only added by renames, so only the directories whose mtime
+        # changed are listed again instead of every file on every rerun
+        for partition_dir in sorted(self.data_path.glob("year=*/month=*")):
+            relative = partition_dir.relative_to(self.data_path).as_posix()
+            if (match := PARTITION_PATTERN.match(relative)) is None:
+                continue
+            mtime_ns = partition_dir.stat().st_mtime_ns
+            listed = self._partition_dirs.get(partition_dir)
+            if (
+                listed is None
+                or listed[0] != mtime_ns
+                or now - mtime_ns < PARTITION_DIR_SETTLE_NS
+            ):
+                listed = (mtime_ns, list_partition_files(partition_dir))
+            partition_dirs[partition_dir] = listed
+            if len(listed[1]) <= 0:
+                continue
+            key = (int(match.group(1)), int(match.group(2)))
+            partitions[key] = [f[0] for f in listed[1]]
+            files.update(listed[1])
+        self._partition_dirs = partition_dirs
+        if frozenset(files) != self._partition_files:
+            self._update_recent_readings(partitions, frozenset(files))
+            self._partition_files = frozenset(files)
+            self.partitions = partitions
+            self.data_version += 1
+
+    def _update_recent_readings(
+        self,
+        partitions: Dict[Tuple[int, int], List[Path]],
+        files: FrozenSet[Tuple[Path, int, int]],
+    ) -> None:
+        # partitions only receive new files, so only those are added to the rings,
+        # otherwise the rings are rebuilt from the files of the last month
+        if self.recent_readings is not None and self._partition_files <= files:
+            recent = self.recent_readings
+            new_files = files - self._partition_files
+        else:
+            recent = RecentReadings.empty()
+            last_files = set()
+            if len(partitions) > 0:
+                last_files = set(partitions[max(partitions.keys())])
+            new_files = {f for f in files if f[0] in last_files}
+        if len(new_files) > 0:
+            ordered = sorted(new_files, key=lambda f: (f[2], f[0]))
+            recent = recent.extend(read_partition_readings([f[0] for f in ordered]))
+        self.recent_readings = recent
+
+    def get_years_and_months(self) -> Dict[str, List[str]]:
+        out: Dict[str, List[str]] = {}
+        for year, month in sorted(self.partitions.keys()):
+            out.setdefault(str(year), []).append(calendar.month_name[month])
+        return out
+
+    def _get_month_fingerprint(self, year: int, month: int) -> Hashable:
+        return tuple(self._get_month_files(year, month))
+
+    def _get_month_files(self, year: int, month: int) -> List[Tuple[Path, int, int]]:
+        files = set(self.partitions.get((year, month), []))
+        return sorted(f for f in self._partition_files if f[0] in files)
+
+    def _read_month_data(self, year: int, month: int) -> Optional[pd.DataFrame]:
+        files = self.partitions.get((year, month))
+        if files is None:
+            return None
+        data = read_partition_files(files)
+        # the last readings of the month are held into the first step of the next
+        start = pd.Timestamp(year=year, month=month, day=1)
+        in_month = (data["Datetime"] >= start) & (
+            data["Datetime"] < start + pd.offsets.MonthBegin()
+        )
+        return data.loc[in_month].reset_index(drop=True)
+
+    def get_data_range(self) -> Optional[Tuple[datetime.datetime, datetime.datetime]]:
+        if len(self.partitions) <= 0:
+            return None
+        first_year, first_month = min(self.partitions.keys())
+        last_datetime = self.last_data_datetime
+        if last_datetime is None:
+            return None
+        return (
+            datetime.datetime(first_year, first_month, 1),
+            last_datetime + datetime.timedelta(hours=1),
+        )
+
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Convert the electricity usage CSV into year/month partitions",
+    )
+    parser.add_argument("csv", help="Path to the source CSV file")
+    parser.add_argument("output", help="Directory to write the partitions into")
+    args = parser.parse_args()
+    convert_csv_to_partitions(Path(args.csv), Path(args.output))
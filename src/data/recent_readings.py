@@ -0,0 +1,118 @@
+import datetime
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.constants import DEFAULT_DATA_SAMPLING_MINUTE, DEFAULT_RECENT_READINGS
+from src.data.resampling import MAX_READING_HOLD_INTERVALS
+
+
+# The latest readings of every device in a fixed size ring per device, so the live
+# values are read in O(devices) without pivoting the month. The rings are shared
+# through the cache, so new readings are added to a copy instead of in place.
+@dataclass(frozen=True)
+class RecentReadings:
+    devices: pd.Index
+    times: np.ndarray
+    power: np.ndarray
+    # slot of the oldest reading and the number of readings of every device
+    heads: np.ndarray
+    counts: np.ndarray
+
+    @classmethod
+    def empty(cls, capacity: int = DEFAULT_RECENT_READINGS) -> "RecentReadings":
+        return cls(
+            devices=pd.Index([], dtype=object),
+            times=np.full((0, capacity), np.datetime64("NaT", "ns")),
+            power=np.full((0, capacity), np.nan),
+            heads=np.zeros(0, dtype=np.int64),
+            counts=np.zeros(0, dtype=np.int64),
+        )
+
+    @property
+    def capacity(self) -> int:
+        return self.power.shape[1]
+
+    @property
+    def last_datetime(self) -> Optional[datetime.datetime]:
+        times = self.get_latest()["Datetime"].dropna()
+        if len(times) <= 0:
+            return None
+        return times.max().to_pydatetime()
+
+    def get_latest(self, offset: int = 0) -> pd.DataFrame:
+        rows = np.arange(len(self.devices))
+        slots = (self.heads + self.counts - 1 - offset) % self.capacity
+        # devices with offset readings or less have no value at the offset
+        valid = self.counts > offset
+        return pd.DataFrame(
+            {
+                "Datetime": np.where(
+                    valid, self.times[rows, slots], np.datetime64("NaT", "ns")
+                ),
+                "Power (W)": np.where(valid, self.power[rows, slots], np.nan),
+            },
+            index=pd.Index(self.devices, name="Device"),
+        )
+
+    def get_intervals(self) -> np.ndarray:
+        # median gap between the readings of every device in its ring, NaN when the
+        # device has a single reading
+        times = self.times.astype(np.int64).astype(np.float64)
+        times[np.isnat(self.times)] = np.nan
+        gaps = np.diff(np.sort(times, axis=1), axis=1)
+        gaps[gaps <= 0] = np.nan
+        out = np.full(len(self.devices), np.nan)
+        has_gaps = ~np.all(np.isnan(gaps), axis=1)
+        out[has_gaps] = np.nanmedian(gaps[has_gaps], axis=1)
+        return out
+
+    def get_reporting(
+        self, offset: int = 0, sampling_minute: int = DEFAULT_DATA_SAMPLING_MINUTE
+    ) -> pd.DataFrame:
+        # a device that stopped reporting is left out once its reading is no longer
+        # held at the latest reading of all devices, the same as when resampling
+        latest = self.get_latest(offset)
+        step = pd.Timedelta(minutes=sampling_minute).value
+        holds = np.fmax(MAX_READING_HOLD_INTERVALS * self.get_intervals(), step)
+        age = latest["Datetime"].max() - latest["Datetime"]
+        return latest.loc[(age <= pd.to_timedelta(holds, unit="ns")).to_numpy()]
+
+    def extend(self, data: pd.DataFrame) -> "RecentReadings":
+        if len(data) <= 0:
+            return self
+        codes, uniques = pd.factorize(data["Device ID"])
+        new_devices = pd.Index(np.asarray(uniques).astype(str), dtype=object)
+        devices = self.devices.union(new_devices).sort_values()
+        old_rows = devices.get_indexer(self.devices)
+        times = np.full((len(devices), self.capacity), np.datetime64("NaT", "ns"))
+        power = np.full((len(devices), self.capacity), np.nan)
+        heads = np.zeros(len(devices), dtype=np.int64)
+        counts = np.zeros(len(devices), dtype=np.int64)
+        times[old_rows] = self.times
+        power[old_rows] = self.power
+        heads[old_rows] = self.heads
+        counts[old_rows] = self.counts
+
+        # the readings of a device are appended in their order, only the last
+        # capacity of them are written since the older ones would be overwritten
+        rows = devices.get_indexer(new_devices)[codes]
+        ranks = pd.Series(rows).groupby(rows).cumcount().to_numpy()
+        added = np.bincount(rows, minlength=len(devices))
+        keep = ranks >= added[rows] - self.capacity
+        rows, ranks = rows[keep], ranks[keep]
+        slots = (heads[rows] + counts[rows] + ranks) % self.capacity
+        times[rows, slots] = data["Datetime"].to_numpy(dtype="datetime64[ns]")[keep]
+        power[rows, slots] = data["Power (W)"].to_numpy(dtype=np.float64)[keep]
+
+        new_counts = np.minimum(counts + added, self.capacity)
+        heads = (heads + counts + added - new_counts) % self.capacity
+        return RecentReadings(devices, times, power, heads, new_counts)
+
+
+def build_recent_readings(
+    data: pd.DataFrame, capacity: int = DEFAULT_RECENT_READINGS
+) -> RecentReadings:
+    return RecentReadings.empty(capacity).extend(data)
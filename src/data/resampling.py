@@ -0,0 +1,252 @@
+from dataclasses import dataclass
+from typing import List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.constants import DEFAULT_DATA_SAMPLING_MINUTE
+from src.instrumentation import instrumented
+
+# a reading holds its power until the next reading of the device, unless that one
+# is more than this many reporting intervals and more than a grid step away, then
+# the device was offline and its reading only holds for one reporting interval
+MAX_READING_HOLD_INTERVALS = 1.5
+# gaps of a device within a chunk needed to replace its known reporting interval
+MIN_INTERVAL_GAPS = 8
+# grid cells whose covered time is cancelled out by corrections are dropped
+MIN_COVERED_SECONDS = 1e-3
+ACCUMULATED_COLUMNS = ["Energy (kWh)", "Covered (s)"]
+GRID_COLUMNS = ["Datetime", "Power (W)", "Device ID", *ACCUMULATED_COLUMNS]
+WATT_SECONDS_PER_KWH = 3600 * 1000
+
+
+def watts_to_kwh(watts, step: Union[pd.Timedelta, pd.DateOffset]):
+    # energy of a power held for one step of the grid
+    return watts * pd.Timedelta(step).total_seconds() / WATT_SECONDS_PER_KWH
+
+
+def get_empty_grid(accumulated: bool = False) -> pd.DataFrame:
+    data = pd.DataFrame(
+        {
+            "Datetime": pd.Series([], dtype="datetime64[ns]"),
+            "Power (W)": pd.Series([], dtype=np.float32),
+            "Device ID": pd.Categorical([]),
+            "Energy (kWh)": pd.Series([], dtype=np.float64),
+            "Covered (s)": pd.Series([], dtype=np.float32),
+        }
+    )
+    if accumulated:
+        del data["Power (W)"]
+    return data
+
+
+def concat_aligned(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    # align the device categories, otherwise the concatenated column becomes object
+    categories = frames[0]["Device ID"].cat.categories
+    for d in frames[1:]:
+        categories = categories.union(d["Device ID"].cat.categories)
+    aligned = []
+    for d in frames:
+        if not d["Device ID"].cat.categories.equals(categories):
+            devices = d["Device ID"].cat.set_categories(categories)
+            d = d.assign(**{"Device ID": devices})
+        aligned.append(d)
+    return pd.concat(aligned, axis=0, ignore_index=True)
+
+
+def integrate_intervals(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    power: np.ndarray,
+    signs: np.ndarray,
+    device_idx: np.ndarray,
+    devices: pd.Index,
+    step: pd.Timedelta,
+) -> pd.DataFrame:
+    keep = ends > starts
+    if not keep.any():
+        return get_empty_grid(accumulated=True)
+    starts, ends, power = starts[keep], ends[keep], power[keep]
+    signs, device_idx = signs[keep], device_idx[keep]
+
+    # split every interval at the grid boundaries it crosses
+    step_ns = step.value
+    first_bin = starts // step_ns
+    counts = (ends - 1) // step_ns - first_bin + 1
+    owner = np.repeat(np.arange(len(starts)), counts)
+    ranks = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+    bins = first_bin[owner] + ranks
+    piece_start = np.maximum(starts[owner], bins * step_ns)
+    piece_end = np.minimum(ends[owner], (bins + 1) * step_ns)
+    seconds = (piece_end - piece_start) / 1e9 * signs[owner]
+
+    # sum the pieces of every (grid step, device)
+    keys, inverse = np.unique(
+        bins * len(devices) + device_idx[owner], return_inverse=True
+    )
+    energy = np.bincount(inverse, weights=power[owner] * seconds)
+    covered = np.bincount(inverse, weights=seconds)
+    return pd.DataFrame(
+        {
+            "Datetime": (keys // len(devices) * step_ns).astype("datetime64[ns]"),
+            "Device ID": pd.Categorical.from_codes(
+                keys % len(devices), categories=devices
+            ),
+            "Energy (kWh)": energy / WATT_SECONDS_PER_KWH,
+            "Covered (s)": covered.astype(np.float32),
+        }
+    )
+
+
+def combine_grid_rows(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    frames = [d for d in frames if len(d) > 0]
+    if len(frames) <= 0:
+        return get_empty_grid()
+    columns = ["Datetime", "Device ID", *ACCUMULATED_COLUMNS]
+    rows = concat_aligned([d.loc[:, columns] for d in frames])
+    if len(frames) > 1:
+        rows = (
+            rows.groupby(["Datetime", "Device ID"], observed=True, sort=True)[
+                ACCUMULATED_COLUMNS
+            ]
+            .sum()
+            .reset_index()
+        )
+    rows = rows.loc[rows["Covered (s)"] > MIN_COVERED_SECONDS]
+    # the power of a grid step is its time weighted mean over the covered time
+    power = rows["Energy (kWh)"] * WATT_SECONDS_PER_KWH / rows["Covered (s)"]
+    grid = rows.assign(
+        **{
+            "Power (W)": power.astype(np.float32),
+            "Covered (s)": rows["Covered (s)"].astype(np.float32),
+        }
+    )
+    return grid.loc[:, GRID_COLUMNS].reset_index(drop=True)
+
+
+def merge_grid(grid: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    if len(rows) <= 0:
+        return grid
+    # new rows only touch the last grid steps, so only the tail is summed again
+    cut = int(grid["Datetime"].searchsorted(rows["Datetime"].min()))
+    tail = combine_grid_rows([grid.iloc[cut:], rows])
+    if cut <= 0:
+        return tail
+    return concat_aligned([grid.iloc[:cut], tail])
+
+
+# Integrates the power of irregular readings over time into the energy of every step
+# of a fixed grid, so the kWh do not depend on the reporting rate of a meter. The
+# readings are passed in chunks of any size: the last reading of every device is
+# held for its reporting interval and corrected once its next reading arrives.
+@dataclass(frozen=True)
+class ReadingResampler:
+    step: pd.Timedelta
+    devices: pd.Index
+    # last reading of every device and its reporting interval, in ns
+    times: np.ndarray
+    power: np.ndarray
+    intervals: np.ndarray
+
+    @classmethod
+    def empty(
+        cls, sampling_minute: int = DEFAULT_DATA_SAMPLING_MINUTE
+    ) -> "ReadingResampler":
+        return cls(
+            step=pd.Timedelta(minutes=sampling_minute),
+            devices=pd.Index([], dtype=object),
+            times=np.zeros(0, dtype=np.int64),
+            power=np.zeros(0, dtype=np.float64),
+            intervals=np.zeros(0, dtype=np.int64),
+        )
+
+    @instrumented("data.resample")
+    def extend(self, readings: pd.DataFrame) -> Tuple[pd.DataFrame, "ReadingResampler"]:
+        # a reading without a device or time cannot be attributed to a grid step
+        readings = readings.dropna(subset=["Datetime", "Device ID"])
+        if len(readings) <= 0:
+            return get_empty_grid(accumulated=True), self
+        codes, uniques = pd.factorize(readings["Device ID"])
+        new_devices = pd.Index(np.asarray(uniques).astype(str), dtype=object)
+        devices = self.devices.union(new_devices).sort_values()
+        old_rows = devices.get_indexer(self.devices)
+        device_idx = devices.get_indexer(new_devices)[codes]
+        times = readings["Datetime"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        power = readings["Power (W)"].to_numpy(dtype=np.float64)
+        order = np.lexsort((times, device_idx))
+        device_idx, times, power = device_idx[order], times[order], power[order]
+
+        # the reporting interval of a device is the median gap between its readings
+        same = device_idx[1:] == device_idx[:-1]
+        gaps = np.diff(times)
+        valid = same & (gaps > 0)
+        gap_stats = (
+            pd.Series(gaps[valid])
+            .groupby(device_idx[1:][valid])
+            .agg(["median", "count"])
+        )
+        known = np.zeros(len(devices), dtype=bool)
+        known[old_rows] = True
+        intervals = np.full(len(devices), self.step.value, dtype=np.int64)
+        intervals[old_rows] = self.intervals
+        measured = gap_stats.index.to_numpy()
+        replace = (gap_stats["count"] >= MIN_INTERVAL_GAPS).to_numpy()
+        replace |= ~known[measured]
+        intervals[measured[replace]] = gap_stats["median"].to_numpy()[replace]
+
+        # every reading holds until the next reading of its device
+        has_next = np.append(same, False)
+        next_times = np.append(times[1:], 0)
+        reading_intervals = intervals[device_idx]
+        held = has_next & (next_times - times <= self._get_max_hold(reading_intervals))
+        ends = np.where(held, next_times, times + reading_intervals)
+
+        # the last reading of a device was held for its interval, which is now
+        # extended or cut back to the next reading of the device
+        prev_times = np.zeros(len(devices), dtype=np.int64)
+        prev_power = np.zeros(len(devices), dtype=np.float64)
+        prev_intervals = np.zeros(len(devices), dtype=np.int64)
+        prev_times[old_rows] = self.times
+        prev_power[old_rows] = self.power
+        prev_intervals[old_rows] = self.intervals
+        firsts = np.flatnonzero(np.append(True, ~same))
+        firsts = firsts[known[device_idx[firsts]]]
+        pending_idx = device_idx[firsts]
+        pending_start = prev_times[pending_idx]
+        provisional = pending_start + prev_intervals[pending_idx]
+        actual = np.where(
+            times[firsts] - pending_start
+            <= self._get_max_hold(prev_intervals[pending_idx]),
+            times[firsts],
+            provisional,
+        )
+        actual = np.maximum(actual, pending_start)
+
+        rows = integrate_intervals(
+            np.concatenate([times, np.minimum(actual, provisional)]),
+            np.concatenate([ends, np.maximum(actual, provisional)]),
+            np.concatenate([power, prev_power[pending_idx]]),
+            np.concatenate(
+                [np.ones(len(times)), np.where(actual > provisional, 1.0, -1.0)]
+            ),
+            np.concatenate([device_idx, pending_idx]),
+            devices,
+            self.step,
+        )
+        lasts = np.flatnonzero(~has_next)
+        prev_times[device_idx[lasts]] = times[lasts]
+        prev_power[device_idx[lasts]] = power[lasts]
+        return rows, ReadingResampler(
+            self.step, devices, prev_times, prev_power, intervals
+        )
+
+    def _get_max_hold(self, intervals: np.ndarray) -> np.ndarray:
+        # missed readings within a grid step are bridged by the previous reading
+        return np.maximum(MAX_READING_HOLD_INTERVALS * intervals, self.step.value)
+
+
+def resample_readings(
+    readings: pd.DataFrame, sampling_minute: int = DEFAULT_DATA_SAMPLING_MINUTE
+) -> pd.DataFrame:
+    rows, _ = ReadingResampler.empty(sampling_minute).extend(readings)
+    return combine_grid_rows([rows])
@@ -0,0 +1,85 @@
+import datetime
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Energy usage (kWh) per hour and device. Hours without any reading of a device are
+# kept as NaN so the coarser rollups only count the days that the device reported.
+@dataclass(frozen=True)
+class RollupIndex:
+    hourly: pd.DataFrame
+
+    @property
+    def devices(self) -> List[str]:
+        return list(self.hourly.columns)
+
+    @property
+    def daily(self) -> pd.DataFrame:
+        return self._resample("D")
+
+    @property
+    def monthly(self) -> pd.DataFrame:
+        return self._resample("MS")
+
+    @property
+    def total(self) -> pd.Series:
+        return self.hourly.sum(axis=0)
+
+    def get_year_months(self) -> List[Tuple[int, int]]:
+        year_months = pd.unique(self.hourly.index.year * 100 + self.hourly.index.month)
+        return [(int(ym) // 100, int(ym) % 100) for ym in year_months]
+
+    def get_range(
+        self, start: datetime.datetime, end: datetime.datetime
+    ) -> "RollupIndex":
+        hourly = self.hourly.loc[
+            (self.hourly.index >= start) & (self.hourly.index < end)
+        ]
+        return RollupIndex(hourly.dropna(axis=1, how="all"))
+
+    def get_month(self, year: int, month: int) -> "RollupIndex":
+        start = pd.Timestamp(year=year, month=month, day=1)
+        return self.get_range(start, start + pd.offsets.MonthBegin())
+
+    def _resample(self, rule: str) -> pd.DataFrame:
+        out = self.hourly.resample(rule).sum(min_count=1)
+        return out.dropna(axis=0, how="all")
+
+
+def build_rollup(data: pd.DataFrame) -> RollupIndex:
+    hours = data["Datetime"].to_numpy(dtype="datetime64[h]").astype(np.int64)
+    first_hour = hours.min() if len(hours) > 0 else 0
+    hour_idx = hours - first_hour
+    device_idx, devices = pd.factorize(data["Device ID"], sort=True)
+    num_hours = int(hour_idx.max()) + 1 if len(hours) > 0 else 0
+
+    # scatter the energy of every grid step into a flat (hour, device) block
+    flat_idx = hour_idx * len(devices) + device_idx
+    energy = data["Energy (kWh)"].to_numpy(dtype=np.float64)
+    size = num_hours * len(devices)
+    block = np.bincount(flat_idx, weights=energy, minlength=size)
+    counts = np.bincount(flat_idx, minlength=size)
+    block[counts == 0] = np.nan
+    block = block.reshape(num_hours, len(devices))
+
+    index = pd.DatetimeIndex(
+        (first_hour + np.arange(num_hours)).astype("datetime64[h]"), name="Datetime"
+    ).as_unit("ns")
+    hourly = pd.DataFrame(block, index=index, columns=[str(d) for d in devices])
+    hourly = hourly.loc[~np.all(np.isnan(block), axis=1)]
+    return RollupIndex(hourly)
+
+
+def concat_rollups(rollups: List[RollupIndex]) -> RollupIndex:
+    hourly = pd.concat([r.hourly for r in rollups], axis=0).sort_index()
+    hourly = hourly.groupby(level=0).sum(min_count=1)
+    return RollupIndex(hourly.reindex(columns=sorted(hourly.columns)))
+
+
+def merge_rollups(rollup: RollupIndex, other: RollupIndex) -> RollupIndex:
+    hourly = rollup.hourly.add(other.hourly, fill_value=0)
+    return RollupIndex(hourly.reindex(columns=sorted(hourly.columns)))
+
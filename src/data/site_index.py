@@ -0,0 +1,137 @@
+import datetime
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Hashable, Optional, Tuple
+
+from src.constants import (
+    DEFAULT_GAP_POLICY,
+    DEFAULT_SITE_INDEX_REFRESH_SECONDS,
+    GapPolicy,
+)
+from src.data.cache import SharedCache
+from src.data.data_handler import DataHandler, create_data_handler
+
+# every site of a multi-site store is a CSV file or a partitioned directory
+SITE_PATTERN = re.compile(r"^site=(.+?)(\.csv)?$")
+
+
+@dataclass(frozen=True)
+class SiteInfo:
+    site: str
+    path: Path
+    devices: Tuple[str, ...]
+    start: Optional[datetime.datetime]
+    end: Optional[datetime.datetime]
+    fingerprint: Hashable
+
+
+def find_site_paths(root: Path) -> Dict[str, Path]:
+    if not root.is_dir():
+        return {}
+    out: Dict[str, Path] = {}
+    for path in sorted(root.iterdir()):
+        match = SITE_PATTERN.match(path.name)
+        if match is None:
+            continue
+        is_csv = match.group(2) is not None
+        if (is_csv and path.is_file()) or (not is_csv and path.is_dir()):
+            out[match.group(1)] = path
+    return out
+
+
+def is_multi_site_store(path: Path) -> bool:
+    return len(find_site_paths(path)) > 0
+
+
+def get_site_fingerprint(path: Path) -> Hashable:
+    if path.is_dir():
+        return tuple(
+            (str(f), s.st_size, s.st_mtime_ns)
+            for f in sorted(path.glob("year=*/month=*/*.parquet"))
+            for s in [f.stat()]
+        )
+    stat = path.stat()
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+# Devices and time range of every site of a multi-site store. The handler of every
+# site is kept, so a site whose files changed only reads its new rows, and the parsed
+# data is shared through the cache with the sessions that select the site.
+class SiteIndex:
+    def __init__(
+        self,
+        root: Path,
+        gap_policy: GapPolicy = DEFAULT_GAP_POLICY,
+        cache: Optional[SharedCache] = None,
+        snapshot_dir: Optional[Path] = None,
+        refresh_seconds: float = DEFAULT_SITE_INDEX_REFRESH_SECONDS,
+    ) -> None:
+        self.root = root
+        self.gap_policy = gap_policy
+        self.cache = cache
+        self.snapshot_dir = snapshot_dir
+        self.refresh_seconds = refresh_seconds
+        self.sites: Dict[str, SiteInfo] = {}
+        self._handlers: Dict[str, DataHandler] = {}
+        self._refreshed_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> None:
+        if not force and self._is_fresh():
+            return
+        # the first refresh is waited for, later ones are skipped while another
+        # session refreshes and the current sites are shown meanwhile
+        if not self._lock.acquire(blocking=self._refreshed_at is None):
+            return
+        try:
+            if not force and self._is_fresh():
+                return
+            refreshed_at = time.monotonic()
+            sites: Dict[str, SiteInfo] = {}
+            handlers: Dict[str, DataHandler] = {}
+            for site, path in find_site_paths(self.root).items():
+                handler = self._handlers.get(site)
+                if handler is None or handler.data_path != path:
+                    handler = create_data_handler(
+                        path,
+                        gap_policy=self.gap_policy,
+                        cache=self.cache,
+                        snapshot_dir=self.snapshot_dir,
+                    )
+                handlers[site] = handler
+                fingerprint = get_site_fingerprint(path)
+                info = self.sites.get(site)
+                if info is None or info.fingerprint != fingerprint:
+                    info = self._load_site_info(site, handler, fingerprint)
+                sites[site] = info
+            self._handlers = handlers
+            self.sites = sites
+            self._refreshed_at = refreshed_at
+        finally:
+            self._lock.release()
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._refreshed_at is not None
+            and time.monotonic() - self._refreshed_at < self.refresh_seconds
+        )
+
+    def _load_site_info(
+        self, site: str, data: DataHandler, fingerprint: Hashable
+    ) -> SiteInfo:
+        data.load_data()
+        data_range = data.get_data_range()
+        # a partitioned site only reads its last month, so its devices are the ones
+        # that reported in that month
+        devices = () if data.recent_readings is None else data.recent_readings.devices
+        return SiteInfo(
+            site=site,
+            path=data.data_path,
+            devices=tuple(str(d) for d in devices),
+            start=None if data_range is None else data_range[0],
+            end=None if data_range is None else data_range[1],
+            fingerprint=fingerprint,
+        )
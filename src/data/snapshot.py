@@ -0,0 +1,55 @@
+import hashlib
+import os
+import pickle
+import uuid
+from pathlib import Path
+from typing import Any, Hashable, Optional
+
+from src.instrumentation import instrumented
+
+# bumped whenever the pickled classes change, so older snapshots are not loaded
+SNAPSHOT_VERSION = 2
+
+
+# Pickles of parsed state kept on disk across server restarts. Every snapshot is
+# stored with the fingerprint of the source it was built from and only loaded while
+# the source still has the same fingerprint, otherwise it is rebuilt and replaced.
+class SnapshotStore:
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+
+    @instrumented("data.load_snapshot")
+    def load(self, key: Hashable, fingerprint: Hashable) -> Optional[Any]:
+        try:
+            with open(self._get_path(key), "rb") as f:
+                version, stored_key, stored_fingerprint, value = pickle.load(f)
+        except Exception:
+            # missing, or pickled by an older version of the app
+            return None
+        if (version, stored_key, stored_fingerprint) != (
+            SNAPSHOT_VERSION,
+            key,
+            fingerprint,
+        ):
+            return None
+        return value
+
+    @instrumented("data.save_snapshot")
+    def save(self, key: Hashable, fingerprint: Hashable, value: Any) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._get_path(key)
+        # written next to the snapshot and renamed, so readers never see half a file
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(
+                    (SNAPSHOT_VERSION, key, fingerprint, value),
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def _get_path(self, key: Hashable) -> Path:
+        return self.directory / f"{hashlib.sha1(repr(key).encode()).hexdigest()}.pkl"
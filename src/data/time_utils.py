@@ -0,0 +1,15 @@
+import numpy as np
+import pandas as pd
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def get_minute_of_day(datetimes: pd.Series) -> pd.Series:
+    minutes = datetimes.to_numpy(dtype="datetime64[m]").astype(np.int64)
+    return pd.Series(
+        minutes % MINUTES_PER_DAY, index=datetimes.index, name=datetimes.name
+    )
+
+
+def get_date(datetimes: pd.Series) -> pd.Series:
+    return datetimes.dt.normalize()
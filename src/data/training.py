@@ -0,0 +1,267 @@
+import copy
+import datetime
+import json
+import os
+import shutil
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from darts import TimeSeries
+from darts.models import LightGBMModel
+
+from src.constants import (
+    DEFAULT_DATA_SAMPLING_MINUTE,
+    DEFAULT_GAP_POLICY,
+    DEFAULT_VALIDATION_DAYS,
+    MODEL_FUTURE_LAGS,
+    MODEL_LAGS,
+    MODEL_OUTPUT_CHUNK_LENGTH,
+    GapPolicy,
+)
+from src.data.data_handler import DataHandler, create_data_handler
+from src.data.forecaster import get_minute_covariates, get_model_components
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+@dataclass(frozen=True)
+class ModelVersion:
+    version: str
+    path: str
+    base_version: Optional[str]
+    trained_from: str
+    trained_until: str
+    rounds: int
+    components: List[str]
+    validation_mae: Optional[float]
+
+
+def get_versions_dir(model_path: Path) -> Path:
+    return model_path.parent / "versions"
+
+
+def get_version_path(model_path: Path, version: str) -> Path:
+    name = f"{model_path.stem}-{version}{model_path.suffix}"
+    return get_versions_dir(model_path) / name
+
+
+def get_group_model_path(model_dir: Path, devices: List[str]) -> Path:
+    return model_dir / f"{'_'.join(devices)}.pkl"
+
+
+def read_model_versions(model_path: Path) -> List[ModelVersion]:
+    manifest = get_versions_dir(model_path) / MANIFEST_NAME
+    if not manifest.exists():
+        return []
+    with open(manifest) as f:
+        versions = [ModelVersion(**json.loads(line)) for line in f if line.strip()]
+    # the device group models of a directory share its manifest
+    return [
+        v
+        for v in versions
+        if Path(v.path).name == get_version_path(model_path, v.version).name
+    ]
+
+
+def load_training_series(
+    data: DataHandler,
+    components: Optional[List[str]] = None,
+    since: Optional[datetime.datetime] = None,
+) -> List[TimeSeries]:
+    # the first window of new samples needs the lags of the samples before it
+    if since is not None:
+        history = MODEL_LAGS + MODEL_OUTPUT_CHUNK_LENGTH
+        since -= datetime.timedelta(minutes=history * DEFAULT_DATA_SAMPLING_MINUTE)
+    out = []
+    for year, months in data.get_years_and_months().items():
+        for month in months:
+            data.set_year_and_month(year, month)
+            series = data.month_series_minutely
+            if series is None:
+                continue
+            if since is not None:
+                if series.end_time() <= since:
+                    continue
+                if series.start_time() <= since:
+                    series = series.drop_before(pd.Timestamp(since))
+            if components is None:
+                components = list(series.components)
+            # the model input has one column per device, so the devices must match
+            if not set(components) <= set(series.components):
+                continue
+            if len(series) > MODEL_LAGS + MODEL_OUTPUT_CHUNK_LENGTH:
+                out.append(series[components])
+    return out
+
+
+def split_validation(
+    series: List[TimeSeries], validation_days: int
+) -> Tuple[List[TimeSeries], Optional[TimeSeries]]:
+    validation_samples = validation_days * 24 * 60 // DEFAULT_DATA_SAMPLING_MINUTE
+    if validation_samples <= 0 or len(series) <= 0:
+        return series, None
+    last = series[-1]
+    if len(last) - validation_samples <= MODEL_LAGS + MODEL_OUTPUT_CHUNK_LENGTH:
+        return series, None
+    return [*series[:-1], last[:-validation_samples]], last[-validation_samples:]
+
+
+def train_model(series: List[TimeSeries], rounds: int) -> LightGBMModel:
+    model = LightGBMModel(
+        lags=MODEL_LAGS,
+        lags_future_covariates=MODEL_FUTURE_LAGS,
+        output_chunk_length=MODEL_OUTPUT_CHUNK_LENGTH,
+        n_estimators=rounds,
+        verbose=-1,
+    )
+    model.fit(
+        series=series,
+        future_covariates=[get_minute_covariates(s, 0) for s in series],
+    )
+    return model
+
+
+def retrain_model(
+    model: LightGBMModel, series: List[TimeSeries], rounds: int
+) -> LightGBMModel:
+    model = copy.deepcopy(model)
+    # build the lag table exactly like darts does at fit time, then continue the
+    # boosting of every per-step booster with the new samples
+    features, labels = model._create_lagged_data(
+        series, None, [get_minute_covariates(s, 0) for s in series], None
+    )
+    estimators = model.model.estimators_
+    if labels.shape[1] != len(estimators):
+        raise ValueError("The new data does not match the outputs of the model")
+    for i, estimator in enumerate(estimators):
+        booster = estimator.booster_
+        estimator.set_params(n_estimators=rounds)
+        estimator.fit(features, labels[:, i], init_model=booster)
+    return model
+
+
+def evaluate_model(
+    model: LightGBMModel, series: TimeSeries, validation: TimeSeries
+) -> float:
+    predicted = model.predict(
+        len(validation),
+        series=series,
+        future_covariates=get_minute_covariates(series, len(validation)),
+    )
+    return float(np.mean(np.abs(predicted.values() - validation.values())))
+
+
+def save_model_version(
+    model: LightGBMModel,
+    model_path: Path,
+    series: List[TimeSeries],
+    rounds: int,
+    base_version: Optional[str],
+    validation_mae: Optional[float],
+) -> ModelVersion:
+    versions_dir = get_versions_dir(model_path)
+    versions_dir.mkdir(parents=True, exist_ok=True)
+    version = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    version_path = get_version_path(model_path, version)
+    model.save(str(version_path))
+    # the app reloads the model when the file changes, so it is swapped atomically
+    tmp_path = model_path.with_name(f".{model_path.name}.tmp")
+    shutil.copyfile(version_path, tmp_path)
+    os.replace(tmp_path, model_path)
+
+    model_version = ModelVersion(
+        version=version,
+        path=str(version_path),
+        base_version=base_version,
+        trained_from=str(min(s.start_time() for s in series)),
+        trained_until=str(max(s.end_time() for s in series)),
+        rounds=rounds,
+        components=list(series[0].components),
+        validation_mae=validation_mae,
+    )
+    with open(versions_dir / MANIFEST_NAME, "a") as f:
+        f.write(json.dumps(asdict(model_version)) + "\n")
+    return model_version
+
+
+def train_model_version(
+    data: DataHandler,
+    model_path: Path,
+    retrain: bool,
+    rounds: int,
+    validation_days: int = DEFAULT_VALIDATION_DAYS,
+    components: Optional[List[str]] = None,
+) -> ModelVersion:
+    versions = read_model_versions(model_path)
+    base_version = None
+    if retrain:
+        model: LightGBMModel = LightGBMModel.load(str(model_path))  # type: ignore
+        if len(versions) > 0:
+            base_version = versions[-1].version
+            components: Optional[List[str]] = versions[-1].components
+            since = datetime.datetime.fromisoformat(versions[-1].trained_until)
+        else:
+            # a model that was not trained by this module, e.g. in the notebook
+            components = get_model_components(model)
+            since = None
+        series = load_training_series(data, components, since)
+    else:
+        series = load_training_series(data, components)
+    train, validation = split_validation(series, validation_days)
+    if len(train) <= 0:
+        raise ValueError(f"No new training data in {data.data_path} for {model_path}")
+
+    if retrain:
+        model = retrain_model(model, train, rounds)
+    else:
+        model = train_model(train, rounds)
+    validation_mae = None
+    if validation is not None:
+        validation_mae = evaluate_model(model, train[-1], validation)
+    return save_model_version(
+        model, model_path, train, rounds, base_version, validation_mae
+    )
+
+
+def get_model_groups(
+    model_path: Path, retrain: bool, device_groups: Optional[List[List[str]]]
+) -> List[Tuple[Path, Optional[List[str]]]]:
+    if device_groups is None:
+        if not model_path.is_dir():
+            return [(model_path, None)]
+        if not retrain:
+            raise ValueError(f"Device groups are needed to train {model_path}")
+        # retraining keeps the devices of every model in the directory
+        groups = [(p, None) for p in sorted(model_path.glob("*.pkl"))]
+        if len(groups) <= 0:
+            raise ValueError(f"No model found in {model_path}")
+        return groups
+    devices = [d for group in device_groups for d in group]
+    if len(set(devices)) != len(devices):
+        raise ValueError("A device can only be in one device group")
+    return [(get_group_model_path(model_path, g), g) for g in device_groups]
+
+
+def run_training(
+    data_path: Path,
+    model_path: Path,
+    retrain: bool,
+    rounds: int,
+    validation_days: int = DEFAULT_VALIDATION_DAYS,
+    gap_policy: GapPolicy = DEFAULT_GAP_POLICY,
+    device_groups: Optional[List[List[str]]] = None,
+) -> List[ModelVersion]:
+    groups = get_model_groups(model_path, retrain, device_groups)
+    data = create_data_handler(data_path, gap_policy=gap_policy)
+    data.load_data()
+    # with device groups, one model per group is kept in the model directory for
+    # the parallel forecast mode
+    if device_groups is not None:
+        model_path.mkdir(parents=True, exist_ok=True)
+    return [
+        train_model_version(data, path, retrain, rounds, validation_days, group)
+        for path, group in groups
+    ]
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import signal
+import sys
+from http import HTTPStatus
+from typing import Any, Dict, Optional, Tuple
+
+from src.constants import (
+    DEFAULT_INGEST_FLUSH_ROWS,
+    DEFAULT_INGEST_FLUSH_SECONDS,
+    DEFAULT_INGEST_MAX_BUFFER_ROWS,
+)
+from src.data.ingestion import (
+    InvalidReadingError,
+    ReadingBuffer,
+    ReadingWriter,
+    validate_readings,
+)
+
+MAX_BODY_BYTES = 1024 * 1024
+MAX_HEADER_LINES = 100
+
+
+class HttpError(Exception):
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class IngestionServer:
+    def __init__(
+        self,
+        writer: ReadingWriter,
+        flush_rows: int = DEFAULT_INGEST_FLUSH_ROWS,
+        flush_seconds: float = DEFAULT_INGEST_FLUSH_SECONDS,
+        max_buffer_rows: int = DEFAULT_INGEST_MAX_BUFFER_ROWS,
+    ) -> None:
+        self.writer = writer
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.max_buffer_rows = max_buffer_rows
+        self.buffer = ReadingBuffer()
+        self.accepted = 0
+        self.written = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._flush_needed = asyncio.Event()
+        self._closing = False
+
+    @property
+    def port(self) -> int:
+        if self._server is None:
+            raise RuntimeError("Server has not been started")
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self, host: str, port: int) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._flush_task is not None:
+            # a cancelled write would still finish in its worker thread and its
+            # readings would be written again, so the running flush is awaited
+            self._closing = True
+            self._flush_needed.set()
+            await self._flush_task
+            self._flush_task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if len(self.buffer) <= 0:
+                return
+            data = self.buffer.peek()
+            # file IO runs in a worker thread so that requests keep being accepted,
+            # the readings stay buffered until they are written
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.writer.write, data
+            )
+            self.buffer.discard(len(data))
+            self.written += len(data)
+
+    def handle_update(self, body: bytes) -> Dict[str, Any]:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Body must be valid JSON")
+        try:
+            readings = validate_readings(payload)
+        except InvalidReadingError as e:
+            raise HttpError(HTTPStatus.BAD_REQUEST, str(e))
+        if len(self.buffer) + len(readings) > self.max_buffer_rows:
+            raise HttpError(HTTPStatus.SERVICE_UNAVAILABLE, "Buffer is full")
+        self.buffer.extend(readings)
+        self.accepted += len(readings)
+        if len(self.buffer) >= self.flush_rows:
+            self._flush_needed.set()
+        return {"accepted": len(readings)}
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            if self._closing:
+                break
+            try:
+                await self.flush()
+            except Exception as e:
+                # e.g. a full disk, the readings are written again on the next tick
+                print(f"Flush failed: {type(e).__name__}: {e}", file=sys.stderr)
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            keep_alive = True
+            while keep_alive:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    if path != "/update":
+                        raise HttpError(HTTPStatus.NOT_FOUND, "Not found")
+                    if method != "POST":
+                        raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST")
+                    status, response = HTTPStatus.OK, self.handle_update(body)
+                except HttpError as e:
+                    status, response = e.status, {"error": str(e)}
+                await self._write_response(writer, status, response, keep_alive)
+        except HttpError as e:
+            await self._write_response(writer, e.status, {"error": str(e)}, False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader
+    ) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        parts = request_line.decode("latin-1").split()
+        if len(parts) != 3:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+        headers: Dict[str, str] = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers")
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Body is too large")
+        body = await reader.readexactly(length) if length > 0 else b""
+        return parts[0].upper(), parts[1].split("?")[0], headers, body
+
+    async def _write_response(
+        self,
+        writer: asyncio.StreamWriter,
+        status: HTTPStatus,
+        payload: Dict[str, Any],
+        keep_alive: bool,
+    ) -> None:
+        body = json.dumps(payload).encode()
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+async def run_ingestion_server(
+    writer: ReadingWriter,
+    host: str,
+    port: int,
+    flush_rows: int = DEFAULT_INGEST_FLUSH_ROWS,
+    flush_seconds: float = DEFAULT_INGEST_FLUSH_SECONDS,
+) -> None:
+    server = IngestionServer(writer, flush_rows, flush_seconds)
+    await server.start(host, port)
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+    try:
+        await stop.wait()
+    finally:
+        # buffered readings are written before exiting
+        await server.close()
@@ -0,0 +1,197 @@
+import functools
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    TypeVar,
+)
+
+import pandas as pd
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+METRICS_PREFIX = "electricity_monitor_stage"
+
+
+@dataclass(frozen=True)
+class StageStats:
+    calls: int = 0
+    total_seconds: float = 0.0
+    last_seconds: float = 0.0
+    max_seconds: float = 0.0
+    # only measured while tracemalloc is tracing, e.g. with --trace-memory
+    last_peak_bytes: Optional[int] = None
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.total_seconds / self.calls if self.calls > 0 else 0.0
+
+
+# Timings of the hot path stages of this process. Recording is a lock and a few
+# additions, so the stages are always timed and only the memory tracing is optional.
+class StageRecorder:
+    def __init__(self) -> None:
+        self._stats: Dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def record(
+        self, stage: str, seconds: float, peak_bytes: Optional[int] = None
+    ) -> None:
+        with self._lock:
+            stats = self._stats.get(stage, StageStats())
+            self._stats[stage] = replace(
+                stats,
+                calls=stats.calls + 1,
+                total_seconds=stats.total_seconds + seconds,
+                last_seconds=seconds,
+                max_seconds=max(stats.max_seconds, seconds),
+                last_peak_bytes=peak_bytes,
+            )
+
+    def snapshot(self) -> Dict[str, StageStats]:
+        with self._lock:
+            return dict(self._stats)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        tracing = tracemalloc.is_tracing()
+        stack: List[List[int]] = self._local.__dict__.setdefault("stack", [])
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            # the peak is reset per stage, so the enclosing stage keeps its own
+            if len(stack) > 0:
+                stack[-1][1] = max(stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            stack.append([current, current])
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak_bytes = None
+            if tracing and len(stack) > 0:
+                start_bytes, stage_peak = stack.pop()
+                stage_peak = max(stage_peak, tracemalloc.get_traced_memory()[1])
+                peak_bytes = stage_peak - start_bytes
+                if len(stack) > 0:
+                    stack[-1][1] = max(stack[-1][1], stage_peak)
+            self.record(name, seconds, peak_bytes)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        rows = [
+            {
+                "Stage": stage,
+                "Calls": stats.calls,
+                "Last (ms)": stats.last_seconds * 1000,
+                "Mean (ms)": stats.mean_seconds * 1000,
+                "Max (ms)": stats.max_seconds * 1000,
+                "Peak memory (MB)": (
+                    None
+                    if stats.last_peak_bytes is None
+                    else stats.last_peak_bytes / 2**20
+                ),
+            }
+            for stage, stats in sorted(self.snapshot().items())
+        ]
+        return pd.DataFrame(rows)
+
+    def to_prometheus(self) -> str:
+        snapshot = sorted(self.snapshot().items())
+        lines: List[str] = []
+
+        def add(name: str, kind: str, description: str, samples: list) -> None:
+            metric = f"{METRICS_PREFIX}_{name}"
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for suffix, stage, value in samples:
+                lines.append(f'{metric}{suffix}{{stage="{stage}"}} {value}')
+
+        add(
+            "seconds",
+            "summary",
+            "Wall time spent in a stage.",
+            [("_sum", n, s.total_seconds) for n, s in snapshot]
+            + [("_count", n, s.calls) for n, s in snapshot],
+        )
+        add(
+            "last_seconds",
+            "gauge",
+            "Wall time of the last call of a stage.",
+            [("", n, s.last_seconds) for n, s in snapshot],
+        )
+        add(
+            "max_seconds",
+            "gauge",
+            "Slowest call of a stage.",
+            [("", n, s.max_seconds) for n, s in snapshot],
+        )
+        add(
+            "peak_bytes",
+            "gauge",
+            "Peak traced memory of the last call of a stage.",
+            [
+                ("", n, s.last_peak_bytes)
+                for n, s in snapshot
+                if s.last_peak_bytes is not None
+            ],
+        )
+        return "\n".join(lines) + "\n"
+
+
+RECORDER = StageRecorder()
+
+
+def timed_stage(name: str) -> ContextManager[None]:
+    return RECORDER.stage(name)
+
+
+def instrumented(name: str) -> Callable[[F], F]:
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with RECORDER.stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    recorder = RECORDER
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        body = self.recorder.to_prometheus().encode()
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def start_metrics_server(host: str, port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,8 +1,22 @@
+import datetime
 from typing import Dict, List, Optional, Tuple
 
 import streamlit as st
 
 
+def view_site_selection(site_labels: Dict[str, str]) -> Optional[str]:
+    st.markdown("Select site")
+    return st.selectbox(
+        label="Select site",
+        options=list(site_labels.keys()),
+        index=None,
+        format_func=lambda site: site_labels.get(site, site),
+        placeholder="Select site...",
+        label_visibility="collapsed",
+        key="sel_site",
+    )
+
+
 def view_input_kwh() -> float:
     st.markdown("Specify your electricity rate per kWh (in rupiah)")
     return st.number_input(
@@ -10,6 +24,35 @@ def view_input_kwh() -> float:
     )
 
 
+def view_range_mode_selection() -> bool:
+    mode = st.radio(
+        "Select data by",
+        options=["Month", "Date range"],
+        horizontal=True,
+        key="rad_mode",
+    )
+    return mode == "Date range"
+
+
+def view_date_range_selection(
+    first_date: datetime.date, last_date: datetime.date
+) -> Optional[Tuple[datetime.date, datetime.date]]:
+    st.markdown("Select date range")
+    default_start = max(first_date, last_date - datetime.timedelta(days=90))
+    date_range = st.date_input(
+        "Select date range",
+        value=(default_start, last_date),
+        min_value=first_date,
+        max_value=last_date,
+        label_visibility="collapsed",
+        key="date_range",
+    )
+    # the input holds a single date while the user is still picking the range
+    if not isinstance(date_range, tuple) or len(date_range) != 2:
+        return None
+    return date_range[0], date_range[1]
+
+
 def view_year_month_selection(
     available_months: Dict[str, List[str]],
 ) -> Optional[Tuple[str, str]]:
@@ -0,0 +1,16 @@
+import pandas as pd
+import streamlit as st
+
+
+def view_stage_timings(timings: pd.DataFrame, is_tracing_memory: bool) -> None:
+    with st.expander("Performance", expanded=True):
+        if len(timings) <= 0:
+            st.markdown("No stage has been timed yet...")
+            return
+        if not is_tracing_memory:
+            timings = timings.drop(columns=["Peak memory (MB)"])
+        st.dataframe(timings.round(2), hide_index=True, use_container_width=True)
+        st.markdown(
+            "*the timings are accumulated over all sessions and the background "
+            "forecast of this server"
+        )
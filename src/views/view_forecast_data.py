@@ -1,11 +1,16 @@
+from __future__ import annotations
+
 import calendar
 import datetime
-from typing import Optional, Tuple
+from typing import TYPE_CHECKING, Optional, Tuple
 
 import pandas as pd
-import plotly.express as px
 import streamlit as st
-from darts import TimeSeries
+
+from src.instrumentation import instrumented
+
+if TYPE_CHECKING:
+    from darts import TimeSeries
 
 
 def view_monthly_summary(
@@ -48,6 +53,15 @@ def view_choose_day_to_forecast(last_date: datetime.date) -> Tuple[datetime.date
     return forecast_day, do_inference
 
 
+def view_forecast_age(age: datetime.timedelta, is_outdated: bool) -> None:
+    minutes = int(age.total_seconds() // 60)
+    age_str = "less than a minute" if minutes <= 0 else f"{minutes} minute(s)"
+    caption = f"Forecast was computed {age_str} ago"
+    if is_outdated:
+        caption += ", it is being updated with the newest data"
+    st.caption(caption)
+
+
 def view_forecast_data_selection(series: TimeSeries) -> Tuple[Optional[str], bool]:
     col1, col2 = st.columns(spec=[0.7, 0.3])
     selected_device = None
@@ -76,7 +90,27 @@ def view_monthly_summary_by_forecast(total_kwh: float, total_price: float) -> No
         st.metric("Price After Forecast", f"Rp. {int(total_price):,}".replace(",", "."))
 
 
+def view_zoom_selection(
+    start: datetime.datetime, end: datetime.datetime
+) -> Tuple[datetime.datetime, datetime.datetime]:
+    if start >= end:
+        return start, end
+    zoom = st.slider(
+        "Zoom",
+        min_value=start,
+        max_value=end,
+        value=(start, end),
+        step=datetime.timedelta(minutes=5),
+        format="DD/MM HH:mm",
+        key="zoom_forc",
+    )
+    return zoom[0], zoom[1]
+
+
+@instrumented("view.forecast_chart")
 def view_forecast_usage(combined_data: pd.DataFrame):
+    import plotly.express as px
+
     time_column = "Date" if "Date" in combined_data.columns else "Datetime"
     data_column = (
         "Usage (kWh)" if "Usage (kWh)" in combined_data.columns else "Power (W)"
@@ -1,9 +1,15 @@
-from typing import List, Tuple
+from __future__ import annotations
+
+import datetime
+from typing import TYPE_CHECKING, List, Tuple
 
 import pandas as pd
-import plotly.express as px
 import streamlit as st
-from darts import TimeSeries
+
+from src.instrumentation import instrumented
+
+if TYPE_CHECKING:
+    from darts import TimeSeries
 
 
 def view_monthly_summary(total_kwh: float, total_price: float) -> None:
@@ -15,6 +21,9 @@ def view_monthly_summary(total_kwh: float, total_price: float) -> None:
 
 
 def view_device_portion(device_total_usage: pd.DataFrame) -> None:
+    # plotly is imported by the charts, so the selection page renders without it
+    import plotly.express as px
+
     st.markdown("#### Device Contribution")
     fig = px.pie(device_total_usage, values="Price (Rp)", names="Device")
     st.plotly_chart(fig)
@@ -36,7 +45,27 @@ def view_historical_data_selection(series: TimeSeries) -> Tuple[List[str], bool]
     return selected_devices, is_daily
 
 
+def view_zoom_selection(
+    start: datetime.datetime, end: datetime.datetime
+) -> Tuple[datetime.datetime, datetime.datetime]:
+    if start >= end:
+        return start, end
+    zoom = st.slider(
+        "Zoom",
+        min_value=start,
+        max_value=end,
+        value=(start, end),
+        step=datetime.timedelta(minutes=5),
+        format="DD/MM HH:mm",
+        key="zoom_hist",
+    )
+    return zoom[0], zoom[1]
+
+
+@instrumented("view.historical_chart")
 def view_usage_of_the_month(monthly_usage: pd.DataFrame, is_daily: bool):
+    import plotly.express as px
+
     time_column = "Datetime" if not is_daily else "Date"
     data_column = "Power (W)" if not is_daily else "Usage (kWh)"
     fig = px.line(
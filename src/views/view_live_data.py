@@ -1,14 +1,17 @@
 import datetime
 
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import streamlit as st
 
+from src.instrumentation import instrumented
 
+
+@instrumented("view.live_total")
 def view_live_total(
     current_total: float, previous_total: float, current_date: datetime.datetime
 ) -> None:
+    import plotly.graph_objects as go
+
     datetime_str = current_date.strftime("%d/%m/%Y %H:%M:%S")
     title = "<span style='font-size:1.7em'>Current Usage</span>"
     title += f"<br><br><span style='font-size:1.7em'>{datetime_str}</span>"
@@ -28,7 +31,10 @@ def view_live_total(
     st.plotly_chart(fig, use_container_width=True)
 
 
+@instrumented("view.live_components")
 def view_live_components(data: pd.DataFrame):
+    import plotly.express as px
+
     data = data.copy()
     data["Time"] = "Last"
     fig = px.bar(
@@ -0,0 +1,50 @@
+import datetime
+from typing import List, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from src.instrumentation import instrumented
+
+
+def view_range_summary(
+    total_kwh: float,
+    total_price: float,
+    date_range: Tuple[datetime.date, datetime.date],
+) -> None:
+    start, end = date_range
+    st.markdown(f"#### Usage from {start:%d/%m/%Y} to {end:%d/%m/%Y}")
+    col1, col2 = st.columns(spec=[0.5, 0.5])
+    with col1:
+        st.metric("Total Usage", f"{total_kwh:.3f} kWh".replace(".", ","))
+    with col2:
+        st.metric("Total Price", f"Rp. {int(total_price):,}".replace(",", "."))
+
+
+def view_range_data_selection(devices: List[str]) -> Tuple[List[str], bool]:
+    st.markdown("#### Usage Trend")
+    col1, col2 = st.columns(spec=[0.8, 0.2])
+    with col1:
+        selected_devices = st.multiselect(
+            label="Device",
+            options=[*devices, "All"],
+            placeholder="Select device...",
+            label_visibility="collapsed",
+            key="ms_range",
+        )
+    with col2:
+        is_monthly = st.toggle("Monthly", key="tog_range")
+    return selected_devices, is_monthly
+
+
+@instrumented("view.range_chart")
+def view_usage_of_the_range(range_usage: pd.DataFrame, is_monthly: bool) -> None:
+    import plotly.express as px
+
+    if is_monthly:
+        fig = px.bar(
+            range_usage, x="Date", y="Usage (kWh)", color="Device", barmode="group"
+        )
+    else:
+        fig = px.line(range_usage, x="Date", y="Usage (kWh)", color="Device")
+    st.plotly_chart(fig)
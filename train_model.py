@@ -0,0 +1,24 @@
+from src.arg_parser import TrainArguments, parse_train_args
+from src.data.training import run_training
+
+
+def main(args: TrainArguments) -> None:
+    versions = run_training(
+        args.data,
+        args.model,
+        args.retrain,
+        args.rounds,
+        args.validation_days,
+        args.gap_policy,
+        args.device_groups,
+    )
+    for version in versions:
+        devices = ", ".join(version.components)
+        print(f"Saved model version {version.version} of {devices} to {args.model}")
+        print(f"Trained on {version.trained_from} - {version.trained_until}")
+        if version.validation_mae is not None:
+            print(f"Validation MAE: {version.validation_mae:.3f} W")
+
+
+if __name__ == "__main__":
+    main(parse_train_args())